@@ -1,18 +1,20 @@
 import pygame
-from util import import_image
+from util import import_assets, image_asset
 from pygame.math import Vector2
+from render_backend import get_render_backend
 
 
 class AnimalUI:
 
     # SETUP
 
-    def __init__(self, animal_sprites):
+    def __init__(self, animal_sprites, controls):
 
         # Setup
         self.import_assets()
-        self.display_surface = pygame.display.get_surface()
+        self.display_surface = get_render_backend().surface
         self.animal_sprites = animal_sprites
+        self.controls = controls
         self.debug_string = 'Animal UI'
 
         # Animal object references, for if we are:
@@ -23,17 +25,17 @@ class AnimalUI:
 
     def import_assets(self):
 
-        self.assets = {
-            'animal_menu': import_image('graphics/ui/animals/animal_menu.png', scale=False),
-            'full_heart': import_image('graphics/ui/animals/full_heart.png', scale=False),
-            'empty_heart': import_image('graphics/ui/animals/empty_heart.png', scale=False),
+        self.assets = import_assets({
+            'animal_menu': image_asset('graphics/ui/animals/animal_menu.png', scale=False),
+            'full_heart': image_asset('graphics/ui/animals/full_heart.png', scale=False),
+            'empty_heart': image_asset('graphics/ui/animals/empty_heart.png', scale=False),
             'hover_box': {
-                'tl': import_image('graphics/ui/animals/hover_tl.png', scale=False),
-                'tr': import_image('graphics/ui/animals/hover_tr.png', scale=False),
-                'bl': import_image('graphics/ui/animals/hover_bl.png', scale=False),
-                'br': import_image('graphics/ui/animals/hover_br.png', scale=False)
+                'tl': image_asset('graphics/ui/animals/hover_tl.png', scale=False),
+                'tr': image_asset('graphics/ui/animals/hover_tr.png', scale=False),
+                'bl': image_asset('graphics/ui/animals/hover_bl.png', scale=False),
+                'br': image_asset('graphics/ui/animals/hover_br.png', scale=False)
             }
-        }
+        })
 
         self.font = pygame.font.Font('graphics/font/sproutLands.ttf', 16)
 
@@ -92,9 +94,9 @@ class AnimalUI:
             # Not Active
             # We want to check for changing the hovered on animal
 
-            if pygame.key.get_pressed()[pygame.K_LSHIFT]:
+            if self.controls.get_pressed()[pygame.K_LSHIFT]:
 
-                mouse_pos = pygame.mouse.get_pos() + camera_offset
+                mouse_pos = self.controls.get_mouse_pos() + camera_offset
                 animals_hovering_on = list(filter(
                     lambda s: s.interaction_rect.collidepoint(mouse_pos),
                     self.animal_sprites.sprites()
@@ -141,32 +143,26 @@ class AnimalUI:
         return menu_surf
 
     def display(self, camera_offset):
+        # Returns the rects drawn on screen
 
-        if self.hovering_on is not None:
-
-            self.display_surface.blit(
-                self.assets['hover_box']['tl'],
-                self.assets['hover_box']['tl'].get_rect(topleft=self.hovering_on.interaction_rect.topleft - camera_offset)
-            )
-
-            self.display_surface.blit(
-                self.assets['hover_box']['tr'],
-                self.assets['hover_box']['tr'].get_rect(topright=self.hovering_on.interaction_rect.topright - camera_offset)
-            )
+        drawn_rects = []
 
-            self.display_surface.blit(
-                self.assets['hover_box']['bl'],
-                self.assets['hover_box']['bl'].get_rect(bottomleft=self.hovering_on.interaction_rect.bottomleft - camera_offset)
-            )
+        if self.hovering_on is not None:
 
-            self.display_surface.blit(
-                self.assets['hover_box']['br'],
-                self.assets['hover_box']['br'].get_rect(bottomright=self.hovering_on.interaction_rect.bottomright - camera_offset)
-            )
+            hover_box = self.assets['hover_box']
+            interaction_rect = self.hovering_on.interaction_rect
+            drawn_rects.extend(self.display_surface.blits([
+                (hover_box['tl'], hover_box['tl'].get_rect(topleft=interaction_rect.topleft - camera_offset)),
+                (hover_box['tr'], hover_box['tr'].get_rect(topright=interaction_rect.topright - camera_offset)),
+                (hover_box['bl'], hover_box['bl'].get_rect(bottomleft=interaction_rect.bottomleft - camera_offset)),
+                (hover_box['br'], hover_box['br'].get_rect(bottomright=interaction_rect.bottomright - camera_offset))
+            ]))
 
         if self.menu_shown_for is not None:
 
             menu_surf = self.build_menu_surf()
             menu_rect = menu_surf.get_rect(midbottom=self.menu_shown_for.interaction_rect.midtop - camera_offset)
 
-            self.display_surface.blit(menu_surf, menu_rect)
+            drawn_rects.append(self.display_surface.blit(menu_surf, menu_rect))
+
+        return drawn_rects
@@ -0,0 +1,190 @@
+import os
+import json
+import mmap
+import struct
+import pygame
+from collections import OrderedDict
+from settings import *
+
+
+class AssetCache:
+    # Process-wide store of every surface imported from disk, keyed by (path, scaled)
+    # Identical assets are decoded & scaled once, and the same surface object is handed to every sprite asking for it
+    # Each import adds a reference, and owners release them when done. Once an asset has no references left it is not
+    # freed straight away, but parked in a least-recently-used queue, and only evicted once that queue is full
+
+    def __init__(self, max_unused):
+
+        self.max_unused = max_unused
+
+        self.surfaces = {}
+        self.ref_counts = {}
+        self.unused = OrderedDict()  # Keys with no references, oldest first
+        self.surface_keys = {}  # Surface -> its key, to find a surface's entry without searching them all
+
+        # Called with each surface as it's evicted, e.g. so the texture atlas can reuse the space it took up
+        self.eviction_listeners = []
+
+    @staticmethod
+    def make_key(path, scale):
+
+        return os.path.normpath(path), scale
+
+    def acquire(self, path, scale, loader):
+        # Return the cached surface for this asset, calling loader() to create it if we don't have it yet
+
+        key = self.make_key(path, scale)
+
+        if key not in self.surfaces:
+            self.surfaces[key] = loader()
+            self.ref_counts[key] = 0
+            self.surface_keys[self.surfaces[key]] = key
+
+        self.ref_counts[key] += 1
+        self.unused.pop(key, None)
+
+        return self.surfaces[key]
+
+    def release(self, path, scale):
+
+        key = self.make_key(path, scale)
+
+        if self.ref_counts.get(key, 0) == 0:
+            return
+
+        self.ref_counts[key] -= 1
+        if self.ref_counts[key] == 0:
+            self.unused[key] = None
+            self.evict()
+
+    def evict(self):
+        # Drop the least recently released assets until we're within our allowance of unreferenced surfaces
+
+        while len(self.unused) > self.max_unused:
+            key, _ = self.unused.popitem(last=False)
+            surf = self.surfaces.pop(key)
+            del self.ref_counts[key]
+            del self.surface_keys[surf]
+            for listener in self.eviction_listeners:
+                listener(surf)
+
+    def substitute(self, replacements):
+        # Swap cached surfaces for equivalent ones, e.g. copies moved into a texture atlas
+        # Replacements maps from the surface we hold to the one to hold instead
+
+        for surf, replacement in replacements.items():
+            key = self.surface_keys.pop(surf, None)
+            if key is not None:
+                self.surfaces[key] = replacement
+                self.surface_keys[replacement] = key
+
+    def clear(self):
+
+        self.surfaces.clear()
+        self.ref_counts.clear()
+        self.unused.clear()
+        self.surface_keys.clear()
+
+    def __contains__(self, path_and_scale):
+
+        return self.make_key(*path_and_scale) in self.surfaces
+
+    def __len__(self):
+
+        return len(self.surfaces)
+
+
+ASSET_CACHE = AssetCache(max_unused=ASSET_CACHE_MAX_UNUSED)
+
+
+class AssetPack:
+    # Read side of the asset pack built by support.build_asset_pack
+    # The file is a small header, a JSON index, then raw RGBA pixel buffers already scaled as they would be on import
+    # We memory-map it, so building a surface is just wrapping a slice of the map, no PNG decoding or scaling
+    # Entries remember the size & modification time of the PNG they came from, and are ignored if that has changed
+
+    MAGIC = b'NUTKINPK'
+    VERSION = 1
+    HEADER = struct.Struct('<8sII')  # Magic, version, index length
+
+    def __init__(self, path):
+
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, index_length = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError('%s is not a version %s asset pack' % (path, self.VERSION))
+
+        index = json.loads(bytes(self.map[self.HEADER.size:self.HEADER.size + index_length]))
+        self.data_start = self.HEADER.size + index_length  # Entry offsets are relative to the end of the index
+        self.zoom_factor = index['zoom factor']
+        self.entries = index['entries']
+
+    @staticmethod
+    def make_key(path, scale):
+
+        return '%s|%d' % (os.path.normpath(path).replace(os.sep, '/'), scale)
+
+    @staticmethod
+    def source_stamp(path):
+
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def load(self, path, scale):
+        # Returns a new surface for the asset, or None if the pack doesn't have an up-to-date copy of it
+
+        if scale and self.zoom_factor != ZOOM_FACTOR:
+            return None
+
+        entry = self.entries.get(self.make_key(path, scale))
+        if entry is None or entry['source'] != self.source_stamp(path):
+            return None
+
+        start = self.data_start + entry['offset']
+        pixels = memoryview(self.map)[start:start + entry['length']]
+        return pygame.image.frombuffer(pixels, entry['size'], 'RGBA').convert_alpha()
+
+    @classmethod
+    def write(cls, path, images):
+        # Images is a list of (source path, scale, surface) tuples
+
+        entries = {}
+        buffers = []
+        offset = 0
+        for source_path, scale, surf in images:
+            pixels = pygame.image.tobytes(surf, 'RGBA')
+            entries[cls.make_key(source_path, scale)] = {
+                'offset': offset,
+                'length': len(pixels),
+                'size': surf.get_size(),
+                'source': cls.source_stamp(source_path)
+            }
+            buffers.append(pixels)
+            offset += len(pixels)
+
+        index = json.dumps({'zoom factor': ZOOM_FACTOR, 'entries': entries}).encode()
+
+        with open(path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(index)))
+            f.write(index)
+            for pixels in buffers:
+                f.write(pixels)
+
+
+_asset_pack = None
+_asset_pack_opened = False
+
+
+def get_asset_pack():
+    # Lazily open the asset pack the first time an image is loaded. None if the pack hasn't been built
+
+    global _asset_pack, _asset_pack_opened
+
+    if not _asset_pack_opened:
+        _asset_pack_opened = True
+        if os.path.exists(ASSET_PACK['path']):
+            _asset_pack = AssetPack(ASSET_PACK['path'])
+
+    return _asset_pack
@@ -0,0 +1,141 @@
+import weakref
+import pygame
+from util import *
+from settings import *
+from assets import ASSET_CACHE
+
+
+class TextureAtlas:
+    # Packs animation frames into a few large page surfaces, handing back subsurfaces of the pages in their place
+    # Subsurfaces blit exactly like the surfaces they replace, so sprites don't know the difference
+    # Frames are placed with a shelf packer: each page is split into horizontal shelves as tall as the tallest frame
+    # placed on them, and frames fill shelves left to right, tallest frames first
+    # Frames the asset cache evicts give their space back, which later frames are placed into before any new shelf
+    # Something may still be drawing an evicted frame (e.g. a falling tree effect outliving the trees), so its space is
+    # only given back once nothing refers to the frame any more
+
+    def __init__(self, page_size):
+
+        self.page_size = page_size
+        self.pages = []
+        self.shelves = []  # Per page, a list of [top, height, next free x] for each shelf
+        self.next_shelf_top = []  # Per page, where the next shelf would start
+        self.free_rects = []  # Per page, rects freed by evicted frames
+
+        # Called with a page whenever its pixels change, e.g. so a render backend can upload it again
+        self.page_change_listeners = []
+
+    def new_page(self):
+
+        page = pygame.Surface((self.page_size, self.page_size), pygame.SRCALPHA).convert_alpha()
+        page.fill((0, 0, 0, 0))
+        self.pages.append(page)
+        self.shelves.append([])
+        self.next_shelf_top.append(0)
+        self.free_rects.append([])
+
+    def find_space(self, width, height):
+        # Returns (page index, top-left) for a frame of this size, opening new shelves & pages as needed
+
+        page_index, topleft = self.find_free_rect(width, height)
+        if page_index is not None:
+            return page_index, topleft
+
+        for page_index in range(len(self.pages)):
+
+            for shelf in self.shelves[page_index]:
+                top, shelf_height, next_x = shelf
+                if height <= shelf_height and next_x + width <= self.page_size:
+                    shelf[2] += width
+                    return page_index, (next_x, top)
+
+            top = self.next_shelf_top[page_index]
+            if top + height <= self.page_size:
+                self.shelves[page_index].append([top, height, width])
+                self.next_shelf_top[page_index] += height
+                return page_index, (0, top)
+
+        self.new_page()
+        return self.find_space(width, height)
+
+    def find_free_rect(self, width, height):
+        # Takes space for a frame from the smallest freed rect it fits in, returning (page index, top-left), or
+        # (None, None) if it fits in none. What's left of the rect to the right & below the frame stays free
+
+        fits = [
+            (page_index, rect)
+            for page_index, free_rects in enumerate(self.free_rects)
+            for rect in free_rects if width <= rect.width and height <= rect.height
+        ]
+        if not fits:
+            return None, None
+
+        page_index, rect = min(fits, key=lambda fit: fit[1].width * fit[1].height)
+        free_rects = self.free_rects[page_index]
+        free_rects.remove(rect)
+        if rect.width > width:
+            free_rects.append(pygame.Rect(rect.left + width, rect.top, rect.width - width, height))
+        if rect.height > height:
+            free_rects.append(pygame.Rect(rect.left, rect.top + height, rect.width, rect.height - height))
+        return page_index, rect.topleft
+
+    def free(self, surf):
+        # Gives the space of a frame we handed out back, once the frame is no longer used (see free_rect)
+
+        if not self.owns(surf):
+            return
+
+        page_index = next(i for i, page in enumerate(self.pages) if page is surf.get_parent())
+        rect = pygame.Rect(surf.get_offset(), surf.get_size())
+        weakref.finalize(surf, self.free_rect, page_index, rect).atexit = False
+
+    def free_rect(self, page_index, rect):
+        # Clears a frame's space so another frame can be added there
+
+        page = self.pages[page_index]
+        page.fill((0, 0, 0, 0), rect)
+        self.free_rects[page_index].append(rect)
+        for listener in self.page_change_listeners:
+            listener(page)
+
+    def owns(self, surf):
+
+        return surf.get_parent() is not None and any(surf.get_parent() is page for page in self.pages)
+
+    def add(self, surf):
+
+        page_index, topleft = self.find_space(*surf.get_size())
+        page = self.pages[page_index]
+
+        # Max blending onto the cleared page copies pixels exactly, alpha included
+        page.blit(surf, topleft, special_flags=pygame.BLEND_RGBA_MAX)
+        for listener in self.page_change_listeners:
+            listener(page)
+
+        return page.subsurface(pygame.Rect(topleft, surf.get_size()))
+
+    def pack(self, assets):
+        # Takes a nested structure of dicts & lists of surfaces (as the import functions return) and returns the same
+        # structure with every frame that fits moved into the atlas
+        # The asset cache is pointed at the atlased copies too, so the originals are freed & future imports share them
+
+        is_surface = lambda leaf: isinstance(leaf, pygame.Surface)
+
+        to_pack = {}
+        map_nested(assets, lambda surf: to_pack.setdefault(id(surf), surf), is_surface)
+
+        packed = {}
+        for surf in sorted(to_pack.values(), key=lambda s: s.get_height(), reverse=True):
+            width, height = surf.get_size()
+            if self.owns(surf) or width > self.page_size or height > self.page_size:
+                packed[id(surf)] = surf
+            else:
+                packed[id(surf)] = self.add(surf)
+
+        ASSET_CACHE.substitute({surf: packed[id(surf)] for surf in to_pack.values() if packed[id(surf)] is not surf})
+
+        return map_nested(assets, lambda surf: packed[id(surf)], is_surface)
+
+
+FRAME_ATLAS = TextureAtlas(page_size=ATLAS_PAGE_SIZE)
+ASSET_CACHE.eviction_listeners.append(FRAME_ATLAS.free)
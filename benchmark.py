@@ -0,0 +1,258 @@
+import os
+import sys
+import random
+
+# Must be set before pygame creates the display, so no real window is opened
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from pygame.math import Vector2
+from settings import *
+from controls import Controls, PressedKeys
+from timers import set_tick_source
+from instrumentation import FRAME_PROFILER
+from util import distance_between_vectors, percentile
+from main import Game
+
+
+# Headless, deterministic benchmark of the game loop
+# Runs main.Game on SDL's dummy video driver with a fixed dt and a simulated clock, uncapped, and drives the level
+# through a scripted input timeline. Reports frame time percentiles per phase of the timeline and per stage of the frame
+# Usage: python benchmark.py [seed]
+
+BENCHMARK_DT = 1 / FPS
+BENCHMARK_SEED = 0
+BENCHMARK_STAGES = {
+    # Stage name in the report: path of the profiling scope (see instrumentation.py) it's timed by
+    'event_loop': ('Level.event_loop',),
+    'update': ('update',),
+    'custom_draw': ('Camera.custom_draw',),
+    'uis': ('Level.display_uis',),
+    'frame': ()
+}
+BENCHMARK_PERCENTILES = [50, 95, 99]
+
+
+class ScriptedControls(Controls):
+    # Input comes from the benchmark timeline rather than the keyboard & mouse
+
+    def __init__(self):
+
+        self.held_keys = set()
+        self.queued_events = []
+        self.mouse_pos = (0, 0)
+
+    def hold(self, *keys):
+
+        self.held_keys = set(keys)
+
+    def release_all(self):
+
+        self.held_keys = set()
+
+    def press(self, key):
+        # Queue a key down event for the next frame
+
+        self.queued_events.append(pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode='', scancode=0))
+
+    def get_events(self):
+
+        # Still pump the real queue, so SDL doesn't fill it up
+        pygame.event.pump()
+
+        events, self.queued_events = self.queued_events, []
+        return events
+
+    def get_pressed(self):
+
+        return PressedKeys(self.held_keys)
+
+    def get_mouse_pos(self):
+
+        return self.mouse_pos
+
+
+class Benchmark:
+
+    def __init__(self, seed=BENCHMARK_SEED):
+
+        # Simulated clock: advances by exactly dt every frame, so timers fire on the same frames every run
+        self.ticks = 0
+        set_tick_source(lambda: self.ticks)
+        random.seed(seed)
+
+        self.controls = ScriptedControls()
+        self.game = Game(headless=True, controls=self.controls)
+        self.level = self.game.level
+        self.player = self.level.player
+
+        # Timings: phase -> stage -> list of frame times in seconds
+        self.phase = None
+        self.samples = {}
+        FRAME_PROFILER.enable()
+
+        # Timeline of (phase name, generator function). Each generator yields once per frame it wants run
+        self.timeline = [
+            ('walk', self.walk),
+            ('chop trees', self.chop_trees),
+            ('boat', self.boat),
+            ('sleep', self.sleep),
+            ('weathers', self.weathers)
+        ]
+
+    # TIMING
+
+    def run_frame(self):
+
+        self.game.frame(BENCHMARK_DT)
+        self.ticks += BENCHMARK_DT * 1000
+
+        frame = FRAME_PROFILER.frames[-1]
+        samples = self.samples.setdefault(self.phase, {stage: [] for stage in BENCHMARK_STAGES})
+        for stage, path in BENCHMARK_STAGES.items():
+            samples[stage].append(frame.get(path, 0))
+
+    # SUPPORT
+
+    def frames(self, amount):
+
+        for i in range(amount):
+            yield
+
+    def frames_until(self, condition, max_frames):
+        # Yields frames until condition is true. Returns whether it became true within max_frames
+
+        for i in range(max_frames):
+            if condition():
+                return True
+            yield
+        return condition()
+
+    def place_player(self, pos, facing):
+
+        self.player.pos = Vector2(pos)
+        self.player.rect.center = round(self.player.pos.x), round(self.player.pos.y)
+        self.player.hitbox.center = self.player.rect.center
+        self.player.facing = facing
+        self.player.direction = Vector2()
+
+    def warn(self, message):
+
+        print(f'Warning: {message}, timings for phase "{self.phase}" may not be representative', file=sys.stderr)
+
+    # TIMELINE
+
+    def walk(self):
+        # Run around the map from where the player starts
+
+        start = Vector2(self.player.pos)
+
+        route = [
+            ([pygame.K_RIGHT], 90),
+            ([pygame.K_DOWN], 90),
+            ([pygame.K_LEFT, pygame.K_DOWN], 60),
+            ([pygame.K_LEFT], 90),
+            ([pygame.K_UP], 120),
+            ([pygame.K_RIGHT, pygame.K_UP], 60)
+        ]
+        for keys, amount in route:
+            self.controls.hold(*keys)
+            yield from self.frames(amount)
+        self.controls.release_all()
+
+        if self.player.pos == start:
+            self.warn('player did not move')
+
+    def chop_trees(self):
+        # Stand to the left of a few trees, facing them, holding the axe key until they are stumps
+
+        trees = [t for t in self.level.tree_sprites.sprites() if t.status == 'tree'][:3]
+
+        for tree in trees:
+            self.place_player(tree.interaction_rect.center - PLAYER_TOOL_OFFSET['axe']['right'], 'right')
+            self.controls.hold(pygame.K_c)
+            chopped = yield from self.frames_until(lambda: tree.status == 'stump', max_frames=FPS * 10)
+            self.controls.release_all()
+            yield from self.frames_until(lambda: not self.player.is_tool_use_active(), max_frames=FPS)
+
+            if not chopped:
+                self.warn('a tree was not chopped down')
+
+    def boat(self):
+        # Stand above a boat facing down and press return, then run until the transition & cutscene have finished
+
+        nearby_boat, other_boat = self.level.boat_sprites.sprites()[:2]
+
+        self.place_player((nearby_boat.rect.centerx, nearby_boat.rect.top - TILE_SIZE / 2), 'down')
+        yield
+        self.controls.press(pygame.K_RETURN)
+        yield
+        yield from self.frames_until(lambda: not self.level.is_transition_active(), max_frames=FPS * 30)
+
+        if distance_between_vectors(self.player.rect.midbottom, other_boat.rect.midtop) > TILE_SIZE * 2:
+            self.warn('player did not take the boat')
+
+    def sleep(self):
+        # Skip to night, stand to the right of the bed facing it and press return, then run some of the next day
+
+        day = self.level.day.day
+        bed = self.level.bed_sprite.sprite
+
+        self.level.day.current_time = DAY_LENGTH * (DAY_DIVISIONS[-2] + DAY_DIVISIONS[-1]) / 2
+        self.place_player((bed.rect.right + 1, bed.rect.centery), 'left')
+        yield  # Let the player work out that they are inside the house
+        self.controls.press(pygame.K_RETURN)
+        yield
+        yield from self.frames_until(lambda: not self.level.is_transition_active(), max_frames=FPS * 30)
+        yield from self.frames(FPS * 5)
+
+        if self.level.day.day == day:
+            self.warn('player did not sleep')
+
+    def weathers(self):
+        # Cycle through every weather type, with its particles filling the screen
+
+        day = self.level.day
+        weathers = [
+            ('normal', 'sunny'), ('normal', 'sunny_cloudy'), ('normal', 'cloudy'), ('normal', 'rain'),
+            ('normal', 'heavy_rain'), ('normal', 'snowy'), ('night', 'clear'), ('night', 'thunder')
+        ]
+
+        self.place_player(self.player.pos, 'down')
+        for weather_category, weather_type in weathers:
+            day.weather_category = weather_category
+            day.weather_type = weather_type
+            for particle in day.weather_falling_particles.sprites() + day.weather_floor_particles.sprites():
+                particle.kill()
+            day.initialise_weather_particles()
+            yield from self.frames(FPS * 3)
+
+    # RUNNING
+
+    def run(self):
+
+        for phase, timeline_function in self.timeline:
+            self.phase = phase
+            for _ in timeline_function():
+                self.run_frame()
+
+        set_tick_source(None)
+
+    def report(self):
+
+        columns = [f'p{p}' for p in BENCHMARK_PERCENTILES] + ['max']
+        print(f'{"phase":<12}{"stage":<13}{"frames":>7}' + ''.join(f'{c:>9}' for c in columns) + '   (ms)')
+
+        for phase, stages in self.samples.items():
+            for stage, frame_times in stages.items():
+                frame_times = sorted(frame_times)
+                values = [percentile(frame_times, p) for p in BENCHMARK_PERCENTILES] + [frame_times[-1]]
+                print(f'{phase:<12}{stage:<13}{len(frame_times):>7}' + ''.join(f'{v * 1000:>9.2f}' for v in values))
+
+
+if __name__ == '__main__':
+
+    benchmark = Benchmark(seed=int(sys.argv[1]) if len(sys.argv) > 1 else BENCHMARK_SEED)
+    benchmark.run()
+    benchmark.report()
@@ -1,5 +1,11 @@
+import time
+import heapq
 import pygame
 from settings import *
+from util import merge_rects
+from spatial import SpatialGrid
+from instrumentation import FRAME_PROFILER, profiled
+from render_backend import blit_sequence, get_render_backend
 
 
 class Camera(pygame.sprite.Group):
@@ -9,7 +15,8 @@ class Camera(pygame.sprite.Group):
 
         # Setup
         super().__init__()
-        self.display_surface = pygame.display.get_surface()
+        self.render_backend = get_render_backend()
+        self.display_surface = self.render_backend.surface
         self.offset = pygame.math.Vector2()
 
         self.borders = {
@@ -19,7 +26,107 @@ class Camera(pygame.sprite.Group):
             'right': GAME_WIDTH - WINDOW_WIDTH
         }
 
-    def custom_draw(self, player, day):
+        # The order sprites were added in, which breaks ties in draw order (as sorting the whole group used to)
+        self.add_order = {}
+        self.sprites_added = 0
+
+        # Draw order is z layer, then y, then x, then add order
+        # Static sprites (see Generic.is_static) never move, so their sort key is worked out once, and we find the ones
+        # on screen through a spatial index. Moving sprites (most of them weather particles) mostly move every frame, so
+        # re-bucketing them would cost as much as checking them all, and we just check which are on screen & sort those
+        self.grid = SpatialGrid(CAMERA_GRID_CELL_SIZE)
+        self.static_draw_keys = {}
+        self.dynamic_sprites = {}  # Dict as an ordered set
+
+        # What we drew last frame, for working out what changed when only redrawing dirty rects
+        self.last_drawn = {}  # sprite -> (image, screen rect)
+        self.last_offset = None
+        self.last_sky_luminance = None
+        self.told_to_redraw_last_frame = True
+
+    def add_internal(self, sprite, layer=None):
+
+        super().add_internal(sprite, layer)
+        self.add_order[sprite] = self.sprites_added
+        self.sprites_added += 1
+
+        # Sprites can still be setting their rect & z after being added to groups, so wait until drawing to sort them
+        if getattr(sprite, 'is_static', False):
+            self.grid.add(sprite)
+        else:
+            self.dynamic_sprites[sprite] = None
+
+    def remove_internal(self, sprite):
+
+        super().remove_internal(sprite)
+        del self.add_order[sprite]
+
+        if getattr(sprite, 'is_static', False):
+            self.grid.remove(sprite)
+            self.static_draw_keys.pop(sprite, None)
+        else:
+            del self.dynamic_sprites[sprite]
+
+    def dynamic_draw_key(self, sprite):
+
+        return sprite.rect.centery, sprite.rect.centerx, self.add_order[sprite]
+
+    def get_visible_static_layers(self, view_rect):
+        # Static sprites on screen, as z -> sprites in draw order
+
+        static_draw_keys = self.static_draw_keys
+        layers = {}
+        for sprite in self.grid.query(view_rect):
+            if sprite.rect.colliderect(view_rect):
+                layers.setdefault(sprite.z, []).append(sprite)
+                if sprite not in static_draw_keys:
+                    static_draw_keys[sprite] = sprite.rect.centery, sprite.rect.centerx, self.add_order[sprite]
+
+        for sprites in layers.values():
+            sprites.sort(key=static_draw_keys.__getitem__)
+
+        return layers
+
+    def get_visible_dynamic_layers(self, view_rect):
+        # Moving sprites on screen, as z -> sprites in draw order
+
+        layers = {}
+        for sprite in self.dynamic_sprites:
+            if sprite.rect.colliderect(view_rect):
+                layers.setdefault(sprite.z, []).append(sprite)
+
+        for sprites in layers.values():
+            sprites.sort(key=self.dynamic_draw_key)
+
+        return layers
+
+    def get_view_rect(self):
+        # Area of the map on screen, plus a margin
+
+        return pygame.Rect(self.offset.x, self.offset.y, WINDOW_WIDTH, WINDOW_HEIGHT).inflate(CAMERA_CULL_MARGIN * 2, CAMERA_CULL_MARGIN * 2)
+
+    def update(self, dt):
+        # When profiling, time the updates of each class of sprite separately (in the same order as normal)
+
+        if not FRAME_PROFILER.enabled:
+            super().update(dt)
+            return
+
+        class_times = {}
+        for sprite in self.sprites():
+            start = time.perf_counter()
+            sprite.update(dt)
+            name = type(sprite).__name__ + '.update'
+            class_times[name] = class_times.get(name, 0) + time.perf_counter() - start
+
+        for name, seconds in class_times.items():
+            FRAME_PROFILER.record(name, seconds)
+
+    @profiled()
+    def custom_draw(self, player, day, extra_dirty_rects=(), full_redraw=False, include_sky=True):
+        # Returns the screen rects changed if we only redrew part of the screen (see DIRTY_RECTS), otherwise None
+        # Extra dirty rects are areas other things drew over last frame, so we need to redraw under them
+        # Without the sky, it's up to the caller to multiply the screen by the sky luminance (see Day.display)
 
         # Work out the camera offset so we can draw player at center of screen, making sure to snap at sides of screen
 
@@ -35,16 +142,107 @@ class Camera(pygame.sprite.Group):
         elif self.offset.y > self.borders['bottom']:
             self.offset.y = self.borders['bottom']
 
-        # If we're inside a house, filter out from all the sprites the roof tiles so we don't draw them
-        if player.inside_house:
-            all_sprites = filter(lambda s: s.z != Z_LAYERS['house roof'], self.sprites())
+        # Only sprites on (or just off) screen
+        sprites = self.get_sprites_in_draw_order(self.get_view_rect())
+
+        # Dirty rects need the world drawn onto a surface, which not every render backend does
+        if not (DIRTY_RECTS['enabled'] and self.render_backend.draws_world_to_surface):
+
+            offset_x = int(self.offset.x)
+            offset_y = int(self.offset.y)
+            self.render_backend.blit_sequence([(s.image, (s.rect.x - offset_x, s.rect.y - offset_y)) for s in sprites])
+
+            # Draw the sky luminance
+            day.display(include_sky)
+
+            return None
+
+        return self.draw_dirty(sprites, day, extra_dirty_rects, full_redraw, include_sky)
+
+    def get_sprites_in_draw_order(self, view_rect):
+        # In order of z depth layer, and then within each z layer right-down, merging static & moving sprites
+
+        static_layers = self.get_visible_static_layers(view_rect)
+        dynamic_layers = self.get_visible_dynamic_layers(view_rect)
+
+        static_draw_keys = self.static_draw_keys
+        draw_key = lambda s: static_draw_keys.get(s) or self.dynamic_draw_key(s)
+
+        sprites = []
+        for z in sorted(static_layers.keys() | dynamic_layers.keys()):
+
+            static_sprites = static_layers.get(z, [])
+            dynamic_sprites = dynamic_layers.get(z)
+            sprites.extend(heapq.merge(static_sprites, dynamic_sprites, key=draw_key) if dynamic_sprites else static_sprites)
+
+        return sprites
+
+    # DIRTY RECTS
+
+    def find_dirty_rects(self, sprites):
+        # Screen areas where a sprite appeared, disappeared, moved or changed image since last frame
+        # Also remembers what we're drawing this frame to compare against next frame
+
+        dirty_rects = []
+        last_drawn = self.last_drawn
+        drawn = {}
+
+        for sprite in sprites:
+            image = sprite.image
+            rect = pygame.Rect(sprite.rect.move(-self.offset).topleft, image.get_size())
+            last = last_drawn.pop(sprite, None)
+            if last is None:
+                dirty_rects.append(rect)
+            elif last[0] is not image or last[1] != rect:
+                dirty_rects.append(rect)
+                dirty_rects.append(last[1])
+            drawn[sprite] = (image, rect)
+
+        # Whatever is left was drawn last frame but not this one
+        dirty_rects.extend(rect for image, rect in last_drawn.values())
+
+        self.last_drawn = drawn
+        return dirty_rects
+
+    def draw_dirty(self, sprites, day, extra_dirty_rects, full_redraw, include_sky):
+        # Only redraw the parts of the screen that changed, returning them for the display to update
+        # Or, returns None having redrawn everything if:
+        # (i) we're told to (e.g. something else draws over the whole screen), or were told to last frame
+        # (ii) the camera moved, or the sky changed brightness
+        # (iii) so much changed that redrawing everything is about as quick
+
+        screen_rect = self.display_surface.get_rect()
+        offset = (self.offset.x, self.offset.y)
+        sky_luminance = day.get_sky_luminance()
+
+        dirty_rects = self.find_dirty_rects(sprites)
+
+        # What was drawn over us last frame is still on screen, so we need to redraw everything the frame after too
+        told_to_redraw = full_redraw or self.told_to_redraw_last_frame
+        self.told_to_redraw_last_frame = full_redraw
+
+        if not (told_to_redraw or offset != self.last_offset or sky_luminance != self.last_sky_luminance):
+            dirty_rects = merge_rects([r.clip(screen_rect) for r in dirty_rects + list(extra_dirty_rects) if r.colliderect(screen_rect)])
+            full_redraw = sum(r.width * r.height for r in dirty_rects) > screen_rect.width * screen_rect.height * DIRTY_RECTS['max screen fraction']
         else:
-            all_sprites = self.sprites()
+            full_redraw = True
+
+        self.last_offset = offset
+        self.last_sky_luminance = sky_luminance
+
+        if full_redraw:
+            dirty_rects = [screen_rect]
+
+        drawn_rects = [rect for image, rect in self.last_drawn.values()]
+        for dirty_rect in dirty_rects:
+
+            self.display_surface.set_clip(dirty_rect)
+            self.display_surface.fill('black')
+            blit_sequence(self.display_surface, [(sprites[i].image, drawn_rects[i]) for i in dirty_rect.collidelistall(drawn_rects)])
 
-        # Draw in order of z depth layer, and then within each z layer right-down
-        for sprite in sorted(all_sprites, key=lambda s: (s.z, s.rect.centery, s.rect.centerx)):
-            self.display_surface.blit(sprite.image, sprite.rect.move(-self.offset))
+            # Draw the sky luminance
+            day.display(include_sky)
 
-        # Draw the sky luminance
-        day.display()
+        self.display_surface.set_clip(None)
 
+        return None if full_redraw else dirty_rects
@@ -0,0 +1,194 @@
+import math
+import pygame
+from settings import *
+from spatial import SpatialGrid
+from pygame.math import Vector2
+
+
+class CollisionGroup(pygame.sprite.Group):
+    # Group of sprites that block movement, bucketed by hitbox into a spatial hash, so we only check those near a hitbox
+    # If a sprite's hitbox changes (e.g. a tree becoming a stump), it must tell us with refresh
+
+    def __init__(self, *sprites):
+
+        self.grid = SpatialGrid(COLLISION_GRID_CELL_SIZE, rect_attribute='hitbox')
+
+        # Query results come back in the order sprites were added, the same order as iterating the whole group
+        self.add_order = {}
+        self.sprites_added = 0
+
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+
+        super().add_internal(sprite, layer)
+        self.add_order[sprite] = self.sprites_added
+        self.sprites_added += 1
+
+        # Sprites still set their hitbox after being added to groups, so the grid buckets them when next queried
+        self.grid.add(sprite)
+
+    def remove_internal(self, sprite):
+
+        super().remove_internal(sprite)
+        del self.add_order[sprite]
+        self.grid.remove(sprite)
+
+    def refresh(self, sprite):
+
+        if sprite in self.add_order:
+            self.grid.refresh(sprite)
+
+    def query(self, rect):
+        # Sprites whose hitbox might overlap rect (some may not, but no others do), in the order they were added
+
+        return sorted(self.grid.query(rect), key=self.add_order.__getitem__)
+
+    def colliding(self, hitbox):
+        # Yields the sprites whose hitbox collides with the given one, the same as checking every sprite in turn
+        # The caller may move the hitbox between sprites (e.g. pushing it out of the last one), so each sprite is checked
+        # against where the hitbox is then, and if it leaves the area we looked in, we look again around it for the rest
+
+        margin = COLLISION_GRID_CELL_SIZE * 2
+        area = hitbox.inflate(margin, margin)
+        candidates = self.query(area)
+
+        index = 0
+        while index < len(candidates):
+            sprite = candidates[index]
+            index += 1
+
+            if sprite.hitbox.colliderect(hitbox):
+                yield sprite
+
+                if not area.contains(hitbox):
+                    order = self.add_order[sprite]
+                    area = hitbox.inflate(margin, margin)
+                    candidates = [s for s in self.query(area) if self.add_order[s] > order]
+                    index = 0
+
+    def sweep(self, box, movement):
+        # Moves box (left, top, width, height floats) by movement, stopping where it would first hit a hitbox and
+        # sliding along it with what's left of the movement, so however far it moves in one go it can't pass through
+        # Returns (movement made, whether anything was hit). Hitboxes the box already overlaps don't block it, so
+        # anything stuck inside one can still walk out
+
+        left, top, width, height = box
+        moved = Vector2()
+        remaining = Vector2(movement)
+        blocked = False
+
+        # At most one slide per axis
+        for _ in range(2):
+
+            if not remaining:
+                break
+
+            start = (left + moved.x, top + moved.y, width, height)
+            hit_time, hit_axis = self.get_first_impact(start, remaining)
+            if hit_axis is None:
+                moved += remaining
+                break
+
+            # Move up to the hitbox, and keep the part of the rest along its surface
+            blocked = True
+            moved += remaining * hit_time
+            remaining *= 1 - hit_time
+            if hit_axis == 'x':
+                remaining.x = 0
+            else:
+                remaining.y = 0
+
+        return moved, blocked
+
+    def get_first_impact(self, box, movement):
+        # (time of impact between 0 & 1, axis hit) of the first hitbox box hits moving by movement, or (None, None)
+
+        left, top, width, height = box
+        area = pygame.Rect(
+            math.floor(min(left, left + movement.x)) - 1,
+            math.floor(min(top, top + movement.y)) - 1,
+            math.ceil(width + abs(movement.x)) + 3,
+            math.ceil(height + abs(movement.y)) + 3
+        )
+
+        first_time, first_axis = None, None
+        for sprite in self.query(area):
+            hit_time, hit_axis = get_time_of_impact(box, movement, sprite.hitbox)
+            if hit_axis is not None and (first_time is None or hit_time < first_time):
+                first_time, first_axis = hit_time, hit_axis
+        return first_time, first_axis
+
+    def raycast(self, start, end):
+        # Distance along the line from start to end to where it first enters a hitbox, or None if it enters none
+        # Only checks sprites in the cells the line crosses, stopping at the first cell past a hit
+
+        start = Vector2(start)
+        delta = Vector2(end) - start
+
+        first_time = None
+        checked = set()
+        for cell_time, sprites in self.grid.traverse(start, start + delta):
+
+            # Anything hit later along the line can't be hit before this cell
+            if first_time is not None and first_time <= cell_time:
+                break
+
+            for sprite in sprites:
+                if sprite not in checked:
+                    checked.add(sprite)
+                    hit_time = get_line_entry_time(start, delta, sprite.hitbox)
+                    if hit_time is not None and (first_time is None or hit_time < first_time):
+                        first_time = hit_time
+
+        return None if first_time is None else first_time * delta.length()
+
+
+def get_time_of_impact(box, movement, hitbox):
+    # Swept AABB: when box moving by movement starts overlapping hitbox on both axes at once, as
+    # (time between 0 & 1, axis whose edges met last), or (None, None) if it doesn't (or already overlaps it)
+
+    left, top, width, height = box
+    entry_x, exit_x = get_slab_times(left, left + width, hitbox.left, hitbox.right, movement.x)
+    entry_y, exit_y = get_slab_times(top, top + height, hitbox.top, hitbox.bottom, movement.y)
+
+    entry = max(entry_x, entry_y)
+    if entry >= min(exit_x, exit_y) or entry < -COLLISION_SWEEP_TOLERANCE or entry > 1:
+        return None, None
+    return max(entry, 0), 'x' if entry_x > entry_y else 'y'
+
+
+def get_slab_times(start, end, slab_start, slab_end, speed):
+    # (entry, exit) times of the span start-end moving at speed overlapping the span slab_start-slab_end on one axis
+    # Just touching isn't overlapping, with a little tolerance as positions stopped at an edge aren't exactly on it
+
+    if speed > 0:
+        return (slab_start - end) / speed, (slab_end - start) / speed
+    elif speed < 0:
+        return (slab_end - start) / speed, (slab_start - end) / speed
+    elif end > slab_start + COLLISION_SWEEP_TOLERANCE and start < slab_end - COLLISION_SWEEP_TOLERANCE:
+        return -math.inf, math.inf
+    else:
+        return math.inf, -math.inf
+
+
+def get_line_entry_time(start, delta, rect):
+    # Time (0 at start, 1 at start + delta) the line enters rect, or None if it doesn't (Liang-Barsky clipping)
+    # Running along an edge isn't entering, but a point on the left/top edge is inside, like Rect.collidepoint
+
+    entry, exit = 0, 1
+    axes = ((start.x, delta.x, rect.left, rect.right), (start.y, delta.y, rect.top, rect.bottom))
+    for position, speed, low, high in axes:
+        if speed == 0:
+            if not low <= position < high:
+                return None
+        else:
+            low_time, high_time = (low - position) / speed, (high - position) / speed
+            entry = max(entry, min(low_time, high_time))
+            exit = min(exit, max(low_time, high_time))
+
+    return entry if entry < exit else None
+
+
+# Times & distances within this count as touching rather than overlapping
+COLLISION_SWEEP_TOLERANCE = 1e-6
@@ -0,0 +1,30 @@
+import pygame
+
+
+class Controls:
+    # Where the game reads its input from. By default straight from pygame, but subclasses can script or replay input
+    # Everything reading the keyboard, mouse or event queue should go through here rather than pygame directly
+
+    def get_events(self):
+
+        return pygame.event.get()
+
+    def get_pressed(self):
+
+        return pygame.key.get_pressed()
+
+    def get_mouse_pos(self):
+
+        return pygame.mouse.get_pos()
+
+
+class PressedKeys:
+    # Stands in for pygame.key.get_pressed() when input doesn't come from the keyboard: indexed by key code
+
+    def __init__(self, keys=()):
+
+        self.keys = frozenset(keys)
+
+    def __getitem__(self, key):
+
+        return key in self.keys
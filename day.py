@@ -3,6 +3,10 @@ import pygame
 from util import *
 from settings import *
 from timers import Timer
+from render_backend import get_render_backend
+from atlas import FRAME_ATLAS
+from startup_trace import trace_startup
+from instrumentation import profiled
 from sprites import MovingParticleEffect, StaticParticleEffect, SelfDestructGeneric
 
 
@@ -16,8 +20,9 @@ class Day:
         # - All sprites group, to add weather particles into there for updating & drawing
 
         # Setup
-        self.import_assets()
-        self.display_surface = pygame.display.get_surface()
+        with trace_startup('Day.import_assets'):
+            self.import_assets()
+        self.render_backend = get_render_backend()
         self.weather_floor_particle_rects = weather_floor_particle_rects
 
         # Groups
@@ -25,9 +30,6 @@ class Day:
         self.weather_falling_particles = pygame.sprite.Group()
         self.weather_floor_particles = pygame.sprite.Group()
 
-        # For drawing day luminance cycle
-        self.sky_luminance_image = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-
         # Thunder timers
         self.thunder_timer = Timer(WEATHER_THUNDER['duration'])
         self.thunder_activation_timer = Timer(
@@ -47,7 +49,8 @@ class Day:
         self.new_temperature_and_weather()
 
         # Initialise all the weather particles on screen for the first day
-        self.initialise_weather_particles()
+        with trace_startup('Initial weather particles'):
+            self.initialise_weather_particles()
 
         # Weather particle timer
         self.weather_particle_timer = Timer(
@@ -59,9 +62,9 @@ class Day:
 
     def import_assets(self):
 
-        self.assets = {
-            'weather particles': import_folders_as_lists('graphics/particles/weather', scale=False)
-        }
+        self.assets = FRAME_ATLAS.pack(import_assets({
+            'weather particles': folders_as_lists_asset('graphics/particles/weather', scale=False)
+        }))
 
     # SUPPORT
 
@@ -348,6 +351,7 @@ class Day:
             for i in range(number_to_create):
                 self.create_weather_particle(particle_type, particle_info, False)
 
+    @profiled()
     def update(self, dt):
 
         # Update timers
@@ -370,19 +374,18 @@ class Day:
 
     # DRAWING
 
-    def draw_sky(self):
+    def is_thunder_flashing(self):
 
-        sky_lum = self.get_sky_luminance()
-        self.sky_luminance_image.fill((sky_lum, sky_lum, sky_lum))
-        self.display_surface.blit(self.sky_luminance_image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+        return self.thunder_timer.active and random.randint(0, 9) < WEATHER_THUNDER['intensity']
 
-    def draw_thunder(self):
+    def display(self, include_sky=True):
+        # The sky darkens the screen by multiplying it with the sky luminance
+        # A thunder flash whites out the screen, which multiplied by the sky is just a fill with the sky luminance
+        # If not including the sky, it's left for the caller to multiply in later (see Level.display_transitions)
 
-        if self.thunder_timer.active:
-            if random.randint(0, 9) < WEATHER_THUNDER['intensity']:
-                self.display_surface.fill((255, 255, 255))
+        sky_lum = self.get_sky_luminance() if include_sky else 255
 
-    def display(self):
-
-        self.draw_thunder()
-        self.draw_sky()
+        if self.is_thunder_flashing():
+            self.render_backend.fill((sky_lum, sky_lum, sky_lum))
+        else:
+            self.render_backend.multiply(sky_lum)
@@ -1,6 +1,7 @@
 import pygame
 from util import *
 from settings import *
+from render_backend import get_render_backend
 
 
 class DayUI:
@@ -12,7 +13,7 @@ class DayUI:
     def __init__(self, day):
 
         self.import_assets()
-        self.display_surface = pygame.display.get_surface()
+        self.display_surface = get_render_backend().surface
         self.day = day
         self.debug_string = 'Day UI'
 
@@ -20,16 +21,16 @@ class DayUI:
 
     def import_assets(self):
 
-        self.assets = {
-            'base': import_image('graphics/ui/days/daytime_ui.png', scale=False),
+        self.assets = import_assets({
+            'base': image_asset('graphics/ui/days/daytime_ui.png', scale=False),
             'weather': {
-                weather_type: import_folder_as_dict('graphics/ui/days/weather/%s/' % weather_type, scale=False)
+                weather_type: folder_as_dict_asset('graphics/ui/days/weather/%s/' % weather_type, scale=False)
                 for weather_type in ['hot', 'night', 'normal']
             },
-            'thermometer': import_folder_as_dict('graphics/ui/days/thermometer', scale=False),
-            'days_of_week': import_folder_as_dict('graphics/ui//days/days_of_week', scale=False),
-            'arrows': import_folder_as_dict('graphics/ui/days/arrows', scale=False)
-        }
+            'thermometer': folder_as_dict_asset('graphics/ui/days/thermometer', scale=False),
+            'days_of_week': folder_as_dict_asset('graphics/ui//days/days_of_week', scale=False),
+            'arrows': folder_as_dict_asset('graphics/ui/days/arrows', scale=False)
+        })
 
         # Text for some reason has white background. Give all of them transparent background & text a bit less opaque
         for day in self.assets['days_of_week'].values():
@@ -104,9 +105,10 @@ class DayUI:
         return day_surf, day_vars
 
     def display(self, camera_offset):
+        # Returns the rects drawn on screen
 
         current_day_vars = self.day.get_all_vars()
         if current_day_vars != self.day_vars:
             self.day_surf, self.day_vars = self.build_daytime_surf()
 
-        self.display_surface.blit(self.day_surf, UI_POSITIONING['daytime']['offset'])
+        return [self.display_surface.blit(self.day_surf, UI_POSITIONING['daytime']['offset'])]
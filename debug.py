@@ -1,12 +1,15 @@
 import pygame
 from settings import *
+from instrumentation import FRAME_PROFILER, profiled
+from render_backend import get_render_backend
 
 
 class DebugCamera:
 
     def __init__(self, day, player, collision_sprites, tree_sprites, animal_sprites, is_transition_active, is_cutscene_playing, get_active_ui, get_camera_offset):
 
-        self.display_surface = pygame.display.get_surface()
+        self.render_backend = get_render_backend()
+        self.display_surface = self.render_backend.surface
 
         self.day = day
         self.player = player
@@ -24,6 +27,13 @@ class DebugCamera:
         self.y_top = 5
         self.buffer = 5
 
+        # Frame profile chart: one column per frame, stacked by stage, scaled so the frame budget is a fixed height
+        self.profile_frames = 120
+        self.profile_column_width = 2
+        self.profile_pixels_per_ms = 6
+        self.profile_colors = ['#e6194b', '#3cb44b', '#ffe119', '#4363d8', '#f58231', '#911eb4', '#46f0f0', '#f032e6', '#bcf60c', '#fabebe']
+        self.profile_stage_colors = {'other': '#808080'}
+
     def draw_text_box(self, text_str, font):
 
         surf = font.render(text_str, False, 'White')
@@ -32,11 +42,66 @@ class DebugCamera:
         self.display_surface.blit(surf, rect)
         self.y_top += rect.height + self.buffer
 
+    def get_profile_stage_color(self, stage):
+        # Stages keep the colour they were first given, so the chart doesn't flicker
+
+        if stage not in self.profile_stage_colors:
+            self.profile_stage_colors[stage] = self.profile_colors[(len(self.profile_stage_colors) - 1) % len(self.profile_colors)]
+        return self.profile_stage_colors[stage]
+
+    def draw_frame_profile(self):
+        # Stacked bar chart of the last frames' stage timings in the bottom right, with a line at the frame budget
+        # Next to it a legend of each stage's time in the latest frame & slowest frame, and what was slowest in that frame
+
+        frames = FRAME_PROFILER.last_frames(self.profile_frames)
+        if not frames:
+            return
+
+        budget_ms = 1000 / FPS
+        chart_height = int(budget_ms * self.profile_pixels_per_ms * 2)
+        chart_rect = pygame.Rect(0, 0, self.profile_frames * self.profile_column_width, chart_height)
+        chart_rect.bottomright = (WINDOW_WIDTH - self.buffer, WINDOW_HEIGHT - self.buffer)
+        pygame.draw.rect(self.display_surface, 'black', chart_rect)
+
+        for i, frame in enumerate(frames):
+            x = chart_rect.left + i * self.profile_column_width
+            y = chart_rect.bottom
+            for stage, seconds in FRAME_PROFILER.stage_times(frame).items():
+                height = round(seconds * 1000 * self.profile_pixels_per_ms)
+                height = min(height, y - chart_rect.top)
+                if height > 0:
+                    y -= height
+                    self.display_surface.fill(self.get_profile_stage_color(stage), (x, y, self.profile_column_width, height))
+
+        budget_y = chart_rect.bottom - round(budget_ms * self.profile_pixels_per_ms)
+        pygame.draw.line(self.display_surface, 'white', (chart_rect.left, budget_y), (chart_rect.right - 1, budget_y))
+
+        # Legend
+        latest_stages = FRAME_PROFILER.stage_times(frames[-1])
+        slowest_frame = max(frames, key=lambda f: f[()])
+        slowest_stages = FRAME_PROFILER.stage_times(slowest_frame)
+        slowest_leaf_seconds, slowest_leaf_path = FRAME_PROFILER.slowest_leaf(slowest_frame)
+
+        lines = [('Frame: %.1f ms, slowest %.1f ms' % (frames[-1][()] * 1000, slowest_frame[()] * 1000), 'white')]
+        for stage in slowest_stages:
+            lines.append(('%s: %.1f / %.1f ms' % (stage, latest_stages.get(stage, 0) * 1000, slowest_stages[stage] * 1000), self.get_profile_stage_color(stage)))
+        lines.append(('Slowest: %s %.1f ms' % (' > '.join(slowest_leaf_path), slowest_leaf_seconds * 1000), 'white'))
+
+        y = chart_rect.bottom
+        for text, color in reversed(lines):
+            surf = self.small_font.render(text, False, color)
+            rect = surf.get_rect(bottomright=(chart_rect.left - self.buffer, y))
+            pygame.draw.rect(self.display_surface, 'black', rect)
+            self.display_surface.blit(surf, rect)
+            y = rect.top
+
+    @profiled()
     def draw(self, dt):
 
         if not DEBUG:
             return
 
+        self.render_backend.mark_overlay_drawn([self.display_surface.get_rect()])
         self.y_top = 5
         camera_offset = self.get_camera_offset()
 
@@ -114,3 +179,6 @@ class DebugCamera:
             for animal in self.animal_sprites.sprites():
                 pygame.draw.rect(self.display_surface, 'yellow', animal.interaction_rect.move(-camera_offset), 1)
 
+        # Frame Profile (last, so nothing is drawn over it)
+        if DEBUG_OPTIONS['frame profile']:
+            self.draw_frame_profile()
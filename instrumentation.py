@@ -0,0 +1,132 @@
+import time
+import functools
+from settings import *
+from collections import deque
+from contextlib import nullcontext
+
+
+# Disabled scopes all share this, so a disabled scope costs one function call and an empty with block
+NULL_SCOPE = nullcontext()
+
+
+class FrameProfiler:
+    # Named, nestable timing scopes for each frame, keeping the last few frames so we can see what caused a stutter
+    # Each frame is a dict from a scope's path (tuple of names from the outermost scope in) to seconds spent in it
+    # Does nothing unless enabled: by FRAME_PROFILE['enabled'], by the frame profile debug option, or calling enable()
+
+    def __init__(self, enabled, history):
+
+        self.enabled = enabled
+        self.frames = deque(maxlen=history)
+        self.stack = ()
+        self.current = {}
+        self.frame_start = None
+
+    def enable(self):
+
+        self.enabled = True
+
+    def begin_frame(self):
+
+        if not self.enabled:
+            return
+
+        self.stack = ()
+        self.current = {}
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        # The frame's total time goes under the empty path
+
+        if not self.enabled or self.frame_start is None:
+            return
+
+        self.current[()] = time.perf_counter() - self.frame_start
+        self.frames.append(self.current)
+        self.frame_start = None
+
+    def scope(self, name):
+
+        if not self.enabled:
+            return NULL_SCOPE
+        return ProfileScope(self, name)
+
+    def timed(self, name=None):
+        # Decorator version of scope, named after the function unless given a name
+        # Whether we're enabled is checked per call, so functions decorated at import can be profiled later
+
+        def decorator(func):
+
+            scope_name = func.__qualname__ if name is None else name
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with ProfileScope(self, scope_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def record(self, name, seconds):
+        # Add time measured elsewhere as a child of the current scope, for hot loops where a scope object is too costly
+
+        path = self.stack + (name,)
+        self.current[path] = self.current.get(path, 0) + seconds
+
+    def last_frames(self, amount):
+
+        return list(self.frames)[-amount:]
+
+    @staticmethod
+    def stage_times(frame):
+        # Top level scopes of a frame, plus time not in any scope
+
+        stages = {path[0]: seconds for path, seconds in frame.items() if len(path) == 1}
+        stages['other'] = max(0, frame[()] - sum(stages.values()))
+        return stages
+
+    @staticmethod
+    def slowest_leaf(frame):
+        # Deepest scope that took longest, e.g. the sprite class whose updates took longest
+
+        leaves = [
+            (seconds, path) for path, seconds in frame.items()
+            if path and not any(len(other) > len(path) and other[:len(path)] == path for other in frame)
+        ]
+        return max(leaves) if leaves else (0, ())
+
+
+class ProfileScope:
+
+    __slots__ = ['profiler', 'name', 'start', 'outer_stack']
+
+    def __init__(self, profiler, name):
+
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+
+        profiler = self.profiler
+        self.outer_stack = profiler.stack
+        profiler.stack = self.outer_stack + (self.name,)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+
+        seconds = time.perf_counter() - self.start
+        profiler = self.profiler
+        path = profiler.stack
+        profiler.current[path] = profiler.current.get(path, 0) + seconds
+        profiler.stack = self.outer_stack
+
+
+FRAME_PROFILER = FrameProfiler(
+    enabled=FRAME_PROFILE['enabled'] or (DEBUG and DEBUG_OPTIONS['frame profile']),
+    history=FRAME_PROFILE['history']
+)
+profile_scope = FRAME_PROFILER.scope
+profiled = FRAME_PROFILER.timed
@@ -1,31 +1,42 @@
 import sys
-import regex
 import pygame
 from util import *
 from day import Day
 from settings import *
 from day_ui import DayUI
 from camera import Camera
+from controls import Controls
 from player import Player
 from trees import NormalTree
 from npcs import Chicken, Cow
+from navigation import PenNavigation
+from atlas import FRAME_ATLAS
 from debug import DebugCamera
 from animal_ui import AnimalUI
 from skills_ui import SkillsUI
-from pytmx.util_pygame import load_pygame
+from level_data import load_level
+from tile_layers import AnimationClock, AnimatedChunk, bake_ground_chunks, bake_water_chunks
+from startup_trace import trace_startup
+from instrumentation import profile_scope, profiled
+from render_backend import get_render_backend
 from transition import TransitionWithCutscene, Transition
-from sprites import Generic, Animated, CollisionBlock, HouseWall, Boat, Bed
+from sprites import Generic, Collider, HouseWall, HouseRoof, Boat, Bed
+from collisions import CollisionGroup
 
 
 class Level:
 
     # SETUP
 
-    def __init__(self):
+    def __init__(self, controls=None):
 
         # General Setup
-        self.display_surface = pygame.display.get_surface()
-        self.import_assets()
+        self.render_backend = get_render_backend()
+        self.display_surface = self.render_backend.surface
+        self.controls = Controls() if controls is None else controls
+        self.ui_rects = []
+        with trace_startup('Level.import_assets'):
+            self.import_assets()
 
         # Transitions
         self.boat_transport_transition = TransitionWithCutscene(self.assets['cutscenes']['boat transport'], animation_speed=25)
@@ -36,8 +47,9 @@ class Level:
 
         # Groups
         self.all_sprites = Camera()
-        self.collision_sprites = pygame.sprite.Group()
+        self.collision_sprites = CollisionGroup()
         self.house_floor_sprites = pygame.sprite.Group()
+        self.roof_sprites = pygame.sprite.Group()
         self.animal_sprites = pygame.sprite.Group()
         self.boat_sprites = pygame.sprite.Group()
         self.bed_sprite = pygame.sprite.GroupSingle()
@@ -47,264 +59,242 @@ class Level:
         self.weather_floor_particle_rects = []
 
         # Import Tiled
-        self.setup()
+        with trace_startup('Level.setup'):
+            self.setup()
 
         # Day, Time, and Weather
-        self.day = Day(self.weather_floor_particle_rects, self.all_sprites)
+        with trace_startup('Day'):
+            self.day = Day(self.weather_floor_particle_rects, self.all_sprites)
 
         # UIs
         self.active_ui = None
-        self.day_ui = DayUI(self.day)
-        self.skills_ui = SkillsUI(self.player.skills)
-        self.animal_ui = AnimalUI(self.animal_sprites)
+        with trace_startup('UIs'):
+            self.day_ui = DayUI(self.day)
+            self.skills_ui = SkillsUI(self.player.skills)
+            self.animal_ui = AnimalUI(self.animal_sprites, self.controls)
         self.all_uis = [self.day_ui, self.animal_ui, self.skills_ui]
 
         # Debug Camera
-        self.debug_camera = DebugCamera(
-            day=self.day,
-            player=self.player,
-            collision_sprites=self.collision_sprites,
-            tree_sprites=self.tree_sprites,
-            animal_sprites=self.animal_sprites,
-            is_transition_active=self.is_transition_active,
-            is_cutscene_playing=self.is_transition_playing_cutscene,
-            get_active_ui=self.get_active_ui,
-            get_camera_offset=self.get_camera_offset
-        )
+        with trace_startup('DebugCamera'):
+            self.debug_camera = DebugCamera(
+                day=self.day,
+                player=self.player,
+                collision_sprites=self.collision_sprites,
+                tree_sprites=self.tree_sprites,
+                animal_sprites=self.animal_sprites,
+                is_transition_active=self.is_transition_active,
+                is_cutscene_playing=self.is_transition_playing_cutscene,
+                get_active_ui=self.get_active_ui,
+                get_camera_offset=self.get_camera_offset
+            )
 
     def import_assets(self):
 
-        self.assets = {
-            'background': import_image('data/tmx/map.png'),
-            'water frames': import_folder('graphics/water'),
+        # Animation frames are packed into the texture atlas
+        self.assets = FRAME_ATLAS.pack(import_assets({
+            'water frames': folder_asset('graphics/water'),
             'boat frames': {
-                'right': import_folder('graphics/objects/boat/right'),
-                'left': import_folder('graphics/objects/boat/left')
+                'right': folder_asset('graphics/objects/boat/right'),
+                'left': folder_asset('graphics/objects/boat/left')
             },
             'npc frames': {
                 'chicken': {
-                    color: import_folders_as_lists('graphics/chicken/%s' % color)
+                    color: folders_as_lists_asset('graphics/chicken/%s' % color)
                     for color in list_folder('graphics/chicken')
                 },
                 'cow': {
-                    color: import_folders_as_lists('graphics/cow/%s' % color)
+                    color: folders_as_lists_asset('graphics/cow/%s' % color)
                     for color in list_folder('graphics/cow')
                 }
             },
             'cutscenes': {
+                # Cutscenes are streamed from disk when played, so we only keep where their frames are
                 'boat transport': {
-                    'left': import_folder('graphics/cutscene/boat/left', scale=False),
-                    'right': import_folder('graphics/cutscene/boat/right', scale=False)
+                    'left': 'graphics/cutscene/boat/left',
+                    'right': 'graphics/cutscene/boat/right'
                 },
                 'sleeping': {
-                    'normal': import_folder('graphics/cutscene/sleeping', scale=False)
+                    'normal': 'graphics/cutscene/sleeping'
                 }
             }
-        }
+        }))
 
     def setup(self):
 
-        tmx_data = load_pygame('data/tmx/map.tmx')
-
-        # Background
-        Generic(
-            pos=(0, 0),
-            surf=self.assets['background'],
-            groups=self.all_sprites,
-            z=Z_LAYERS['ground']
-        )
-
-        # Water
-        for x, y, _ in tmx_data.get_layer_by_name('Water').tiles():
-            Animated(
-                pos=(x*TILE_SIZE, y*TILE_SIZE),
-                frames=self.assets['water frames'],
-                groups=self.all_sprites,
-                z=Z_LAYERS['water']
-            )
-
-        # Bushes
-        for x, y, surf in tmx_data.get_layer_by_name('Bushes').tiles():
-            Generic(
-                pos=(x*TILE_SIZE, y*TILE_SIZE),
-                surf=pygame.transform.scale_by(surf, ZOOM_FACTOR),
-                groups=[self.all_sprites, self.collision_sprites]
-            )
+        # Everything we need from the Tiled map, compiled & cached by level_data, so we only parse the .tmx when it changes
+        with trace_startup('Load compiled level'):
+            level_data = load_level('data/tmx/map.tmx')
+
+            surfaces = {}
+            for gid, (size, pixels, has_alpha) in level_data['surfaces'].items():
+                surf = pygame.image.frombuffer(pixels, size, 'RGBA')
+                surfaces[gid] = surf.convert_alpha() if has_alpha else surf.convert()
+
+        # Ground & water are baked into chunks (see tile_layers.py), with all the water animated by one clock
+        # The background is loaded straight from disk rather than through the asset cache, so it's freed once baked
+        # It's loaded unscaled, and scaled up as it's baked
+        with trace_startup('Background'):
+            for pos, surf in bake_ground_chunks(load_image('data/tmx/map.png', scale=False)):
+                Generic(
+                    pos=pos,
+                    surf=surf,
+                    groups=self.all_sprites,
+                    z=Z_LAYERS['ground']
+                )
 
-        # Water Trays
-        for x, y, surf in tmx_data.get_layer_by_name('Water Trays').tiles():
-            Generic(
-                pos=(x*TILE_SIZE, y*TILE_SIZE),
-                surf=pygame.transform.scale_by(surf, ZOOM_FACTOR),
-                groups=[self.all_sprites, self.collision_sprites]
-            )
+        with trace_startup('Water'):
+            self.water_clock = AnimationClock(len(self.assets['water frames']))
+            for pos, frames in bake_water_chunks(level_data['water'], self.assets['water frames']):
+                AnimatedChunk(
+                    pos=pos,
+                    frames=frames,
+                    clock=self.water_clock,
+                    groups=self.all_sprites,
+                    z=Z_LAYERS['water']
+                )
 
-        # Fence
-        for x, y, surf in tmx_data.get_layer_by_name('Fence').tiles():
-            Generic(
-                pos=(x*TILE_SIZE, y*TILE_SIZE),
-                surf=pygame.transform.scale_by(surf, ZOOM_FACTOR),
-                groups=[self.all_sprites, self.collision_sprites]
-            )
+        with trace_startup('Bushes, Water Trays, Fence'):
+            for layer in ['Bushes', 'Water Trays', 'Fence']:
+                for x, y, gid in level_data['tiles'][layer]:
+                    Generic(
+                        pos=(x*TILE_SIZE, y*TILE_SIZE),
+                        surf=surfaces[gid],
+                        groups=[self.all_sprites, self.collision_sprites]
+                    )
 
-        # Trees
-        for obj in tmx_data.get_layer_by_name('Normal Trees'):
-            NormalTree(
-                pos=(obj.x * ZOOM_FACTOR, obj.y * ZOOM_FACTOR),
-                all_sprites=self.all_sprites,
-                groups=[self.all_sprites, self.collision_sprites, self.tree_sprites]
-            )
+        with trace_startup('Trees'):
+            for pos in level_data['normal trees']:
+                NormalTree(
+                    pos=pos,
+                    all_sprites=self.all_sprites,
+                    groups=[self.all_sprites, self.collision_sprites, self.tree_sprites]
+                )
 
-        # House Walls
-        for x, y, surf in tmx_data.get_layer_by_name('House Walls').tiles():
-            HouseWall(
-                pos=(x*TILE_SIZE, y*TILE_SIZE),
-                surf=pygame.transform.scale_by(surf, ZOOM_FACTOR),
-                groups=[self.all_sprites, self.collision_sprites]
-            )
+        with trace_startup('House Walls'):
+            for x, y, gid in level_data['tiles']['House Walls']:
+                HouseWall(
+                    pos=(x*TILE_SIZE, y*TILE_SIZE),
+                    surf=surfaces[gid],
+                    groups=[self.all_sprites, self.collision_sprites]
+                )
 
-        # House Furniture Top
-        for x, y, surf in tmx_data.get_layer_by_name('House Furniture Top').tiles():
-            Generic(
-                pos=(x*TILE_SIZE, y*TILE_SIZE),
-                surf=pygame.transform.scale_by(surf, ZOOM_FACTOR),
-                groups=[self.all_sprites, self.collision_sprites]
-            )
+        with trace_startup('House Furniture Top'):
+            for x, y, gid in level_data['tiles']['House Furniture Top']:
+                Generic(
+                    pos=(x*TILE_SIZE, y*TILE_SIZE),
+                    surf=surfaces[gid],
+                    groups=[self.all_sprites, self.collision_sprites]
+                )
 
-        # House Furniture Interaction
-        for obj in tmx_data.get_layer_by_name('House Furniture Interaction'):
-            if obj.name == 'Bed':
+        with trace_startup('House Furniture Interaction'):
+            for pos, gid in level_data['beds']:
                 Bed(
-                    pos=(obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR),
-                    surf=pygame.transform.scale_by(obj.image, ZOOM_FACTOR),
+                    pos=pos,
+                    surf=surfaces[gid],
                     groups=[self.all_sprites, self.bed_sprite, self.collision_sprites]
                 )
 
-        # Decoration Top
-        for obj in tmx_data.get_layer_by_name('Decoration Top'):
-            Generic(
-                pos=(obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR),
-                surf=pygame.transform.scale_by(obj.image, ZOOM_FACTOR),
-                groups=[self.all_sprites, self.collision_sprites]
-            )
-
-        # Boats
-        for obj in tmx_data.get_layer_by_name('Boats'):
-            Boat(
-                pos=(obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR),
-                frames=self.assets['boat frames'][obj.properties['orientation']],
-                direction_facing=obj.properties['orientation'],
-                groups=[self.all_sprites, self.boat_sprites]
-            )
-
-        # House Roof
-        for x, y, surf in tmx_data.get_layer_by_name('House Roof').tiles():
-            Generic(
-                pos=(x*TILE_SIZE, y*TILE_SIZE),
-                surf=pygame.transform.scale_by(surf, ZOOM_FACTOR),
-                groups=self.all_sprites,
-                z=Z_LAYERS['house roof']
-            )
+        with trace_startup('Decoration Top'):
+            for pos, gid in level_data['decoration top']:
+                Generic(
+                    pos=pos,
+                    surf=surfaces[gid],
+                    groups=[self.all_sprites, self.collision_sprites]
+                )
 
-        # Collision sprites. Not drawn.
-        # There are 4 collision layers, depending on if we want to shift collision hitboxes, and these effects stack
-        # E.g. for corner of river we want to shift up/down AND left/right
-        # Build a mapping from tile index to a shift dictionary
-
-        collision_map = [
-            [{'has_tile': False, 'right': False, 'left': False, 'up': False, 'down': False} for col in range(TILES_WIDE)]
-            for row in range(TILE_HIGH)
-        ]
-
-        for layer in ['Collisions 1', 'Collisions 2', 'Collisions 3', 'Collisions 4']:
-            shift_direction = tmx_data.get_layer_by_name(layer).properties['shift']
-            for x, y, _ in tmx_data.get_layer_by_name(layer).tiles():
-                collision_map[y][x]['has_tile'] = True
-                collision_map[y][x][shift_direction] = True
-
-        for y, row in enumerate(collision_map):
-            for x, tile in enumerate(row):
-                if tile['has_tile']:
-                    CollisionBlock(
-                        pos=(x*TILE_SIZE, y*TILE_SIZE),
-                        shift=tile,
-                        groups=self.collision_sprites
-                    )
+        with trace_startup('Boats'):
+            for pos, orientation in level_data['boats']:
+                Boat(
+                    pos=pos,
+                    frames=self.assets['boat frames'][orientation],
+                    direction_facing=orientation,
+                    groups=[self.all_sprites, self.boat_sprites]
+                )
 
-        # House Tiles
-        for x, y, _ in tmx_data.get_layer_by_name('House Tiles').tiles():
-            Generic(
-                pos=(x*TILE_SIZE, y*TILE_SIZE),
-                surf=pygame.Surface((TILE_SIZE, TILE_SIZE)),
-                groups=self.house_floor_sprites
-            )
+        # One roof sprite per building, which we take out of the camera while the player is inside (see update_roofs)
+        with trace_startup('House Roofs'):
+            for building in level_data['buildings']:
+                HouseRoof(
+                    tiles=[
+                        (surfaces[gid].get_rect(topleft=(x*TILE_SIZE, y*TILE_SIZE)), surfaces[gid])
+                        for x, y, gid in building['roof']
+                    ],
+                    floor_rects=[pygame.Rect((x*TILE_SIZE, y*TILE_SIZE), (TILE_SIZE, TILE_SIZE)) for x, y in building['floor']],
+                    groups=[self.all_sprites, self.roof_sprites]
+                )
 
-        # NPCs. Divided up into Pens, which have two relevant layers (walk area + NPC markers)
-
-        pen_ids = []
-        pen_id_regex = regex.compile(r'^Pen ([0-9]+)$')
-        for layer in tmx_data.layernames:
-            regex_match = pen_id_regex.match(layer)
-            if regex_match is not None:
-                pen_ids.append(regex_match.group(1))
-
-        for id in pen_ids:
-
-            walk_area = []
-            for x, y, _ in tmx_data.get_layer_by_name('Pen %s Walk Area' % id).tiles():
-                walk_area.append(pygame.Rect((x * TILE_SIZE, y * TILE_SIZE), (TILE_SIZE, TILE_SIZE)).inflate(-TILE_SIZE * 0.5, -TILE_SIZE * 0.5))
-
-            for obj in tmx_data.get_layer_by_name('Pen %s NPCs' % id):
-                animal_class = Chicken if obj.name == 'Chicken' else Cow
-                animal_class(
-                    pos=(obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR),
-                    frames=self.assets['npc frames'][obj.name.lower()][obj.properties['color']],
-                    name=obj.properties['nickname'],
-                    walk_area=walk_area,
-                    collision_sprites=self.collision_sprites,
-                    groups=[self.all_sprites, self.animal_sprites]
+        # Collision sprites. Not drawn. Each covers a rectangle of collision tiles (see level_data.merge_collision_tiles)
+        with trace_startup('Collisions'):
+            for left, top, right, bottom, shift in level_data['colliders']:
+                Collider(
+                    tiles=(left, top, right, bottom),
+                    shift=shift,
+                    groups=self.collision_sprites
                 )
 
-        # Player
-        for obj in tmx_data.get_layer_by_name('Player'):
-            if obj.name == 'Start':
-                self.player = Player(
-                    pos=(obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR),
-                    house_floor_sprites=self.house_floor_sprites,
-                    collision_sprites=self.collision_sprites,
-                    tree_sprites=self.tree_sprites,
-                    all_sprites=self.all_sprites,
-                    is_transition_active=self.is_transition_active,
-                    is_ui_active=self.is_ui_active,
-                    disable_uis=self.disable_uis,
-                    groups=self.all_sprites
+        with trace_startup('House Tiles'):
+            for x, y in level_data['house tiles']:
+                Generic(
+                    pos=(x*TILE_SIZE, y*TILE_SIZE),
+                    surf=pygame.Surface((TILE_SIZE, TILE_SIZE)),
+                    groups=self.house_floor_sprites
                 )
 
-        # Weather Floor Particle Positional Information
-        # Generate a list of rects for all the tiles weather floor particles CANNOT land on
-        # We do the opposite way around, as it is quicker computation-wise
-        # Essentially we cannot land a weather particle on the water or the house floor
-
-        valid_weather_floor_particle_positions = []  # List of top-left tile positions where we can place a particle
-        for land_able_layer in ['Grass', 'Bridge']:
-            for x, y, _ in tmx_data.get_layer_by_name(land_able_layer).tiles():
-                valid_top_left = (x*TILE_SIZE, y*TILE_SIZE)
-                if all(s.rect.topleft != valid_top_left for s in self.house_floor_sprites.sprites()):
-                    valid_weather_floor_particle_positions.append(valid_top_left)
-        for x in range(TILES_WIDE):
-            for y in range(TILE_HIGH):
-                invalid_top_left = (x*TILE_SIZE, y*TILE_SIZE)
-                if invalid_top_left not in valid_weather_floor_particle_positions:
-                    self.weather_floor_particle_rects.append(
-                        pygame.Rect(invalid_top_left, (TILE_SIZE, TILE_SIZE))
+        # NPCs. Divided up into Pens, which have a walk area & NPCs
+
+        with trace_startup('NPCs'):
+            for pen in level_data['pens']:
+
+                navigation = PenNavigation(pen['walk area'], self.collision_sprites)
+
+                for npc in pen['npcs']:
+                    animal_class = Chicken if npc['name'] == 'Chicken' else Cow
+                    animal_class(
+                        pos=npc['pos'],
+                        frames=self.assets['npc frames'][npc['name'].lower()][npc['color']],
+                        name=npc['nickname'],
+                        navigation=navigation,
+                        collision_sprites=self.collision_sprites,
+                        groups=[self.all_sprites, self.animal_sprites]
                     )
 
+        with trace_startup('Player'):
+            self.player = Player(
+                pos=level_data['player start'],
+                house_floor_sprites=self.house_floor_sprites,
+                collision_sprites=self.collision_sprites,
+                tree_sprites=self.tree_sprites,
+                all_sprites=self.all_sprites,
+                is_transition_active=self.is_transition_active,
+                is_ui_active=self.is_ui_active,
+                disable_uis=self.disable_uis,
+                controls=self.controls,
+                groups=self.all_sprites
+            )
+
+        # Weather Floor Particle Positional Information
+        # Rects for all the tiles weather floor particles CANNOT land on, e.g. the water or the house floor
+        with trace_startup('Weather floor positions'):
+            for x, y in level_data['weather floor invalid tiles']:
+                self.weather_floor_particle_rects.append(
+                    pygame.Rect((x*TILE_SIZE, y*TILE_SIZE), (TILE_SIZE, TILE_SIZE))
+                )
+
     # SUPPORT
 
     def get_camera_offset(self):
 
         return self.all_sprites.offset
 
+    def update_roofs(self):
+        # Hide the roof of the building the player is in, by taking it out of the camera, and show the others
+
+        for roof in self.roof_sprites:
+            if roof.is_inside(self.player.hitbox):
+                self.all_sprites.remove(roof)
+            elif roof not in self.all_sprites:
+                self.all_sprites.add(roof)
+
     # TRANSITIONS
 
     def is_transition_active(self):
@@ -315,15 +305,20 @@ class Level:
 
         return any(t.cutscene_active() for t in self.all_transitions_with_cutscenes)
 
+    @profiled()
     def update_transitions(self, dt):
 
         for t in self.all_transitions:
             t.update(dt)
 
-    def display_transitions(self):
+    @profiled()
+    def display_transitions(self, sky_lum=255):
+        # Sky luminance the camera left out, to multiply in with the active transition's fade
 
         for t in self.all_transitions:
-            t.display()
+            if t.active:
+                t.display(sky_lum)
+                sky_lum = 255
 
     def activate_transition(self, transition_to_activate, func, cutscene_key=None):
         # We put in this function so we can group together the operation of
@@ -339,12 +334,16 @@ class Level:
 
     # UIs
 
+    @profiled()
     def display_uis(self):
         # To simplify logic, just iterate and display all UIs
         # Up to UI class to not draw anything if it's not active
+        # Returns the rects the UIs drew on screen
 
+        drawn_rects = []
         for ui in self.all_uis:
-            ui.display(self.get_camera_offset())
+            drawn_rects.extend(ui.display(self.get_camera_offset()))
+        return drawn_rects
 
     def disable_uis(self, skip_active_ui=False):
         # Disable all UI components. Called when:
@@ -415,9 +414,10 @@ class Level:
 
     # EVENTS
 
+    @profiled()
     def event_loop(self):
 
-        for event in pygame.event.get():
+        for event in self.controls.get_events():
 
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -509,6 +509,7 @@ class Level:
 
     # INPUTS
 
+    @profiled()
     def inputs(self):
 
         if not self.is_transition_active() and not self.player.is_tool_use_active():
@@ -526,24 +527,59 @@ class Level:
         for tree in self.tree_sprites.sprites():
             tree.refresh_new_day()
 
+    def needs_full_redraw(self):
+        # When only redrawing dirty rects (see DIRTY_RECTS), these draw over the whole screen so need it all redrawn
+
+        return DEBUG or self.is_transition_active() or self.day.thunder_timer.active
+
     def run(self, dt):
+        # Returns the screen rects that changed, or None if it all might have
 
         # Event Loop & Inputs
         self.event_loop()
         self.inputs()
 
         # Update
-        self.day.update(dt)
-        self.all_sprites.update(dt)
-        self.update_transitions(dt)
+        with profile_scope('update'):
+            self.day.update(dt)
+            self.water_clock.update(dt)
+            self.all_sprites.update(dt)
+            self.update_roofs()
+            self.update_transitions(dt)
 
         # Rendering
 
-        if not self.is_transition_playing_cutscene():
-            # We only want to draw normal stuff if no cutscene is being played by transitions
+        updated_rects = None
+        sky_lum = 255
+
+        # We only want to draw normal stuff if no cutscene is being played by transitions
+        draw_level = not self.is_transition_playing_cutscene()
 
-            self.all_sprites.custom_draw(self.player, self.day)
+        if draw_level:
+
+            # While a transition is fading the screen, the sky is multiplied in along with the fade, in one pass
+            include_sky = not self.is_transition_active()
+            if not include_sky:
+                sky_lum = self.day.get_sky_luminance()
+
+            # The camera redraws under where UIs were last frame, as they're drawn over the top of it
+            updated_rects = self.all_sprites.custom_draw(
+                self.player,
+                self.day,
+                extra_dirty_rects=self.ui_rects,
+                full_redraw=self.needs_full_redraw(),
+                include_sky=include_sky
+            )
+
+        # Everything else is drawn over the world, straight onto the display surface
+        if draw_level:
             self.debug_camera.draw(dt)
-            self.display_uis()
+            self.ui_rects = self.display_uis()
+            self.render_backend.mark_overlay_drawn(self.ui_rects)
+
+            if updated_rects is not None:
+                updated_rects.extend(self.ui_rects)
+
+        self.display_transitions(sky_lum)
 
-        self.display_transitions()
+        return updated_rects
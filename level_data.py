@@ -0,0 +1,269 @@
+import os
+import pickle
+import hashlib
+import regex
+import pygame
+from settings import *
+from xml.etree import ElementTree
+from startup_trace import trace_startup
+from pytmx.util_pygame import load_pygame
+
+
+# Bump whenever compile_level changes what it produces, so stale compiled levels get rebuilt
+COMPILED_LEVEL_VERSION = 4
+COMPILED_LEVEL_EXTENSION = '.compiled'  # Saved next to the .tmx it was compiled from
+
+# Tile layers placed as plain sprites, which we keep the tile graphic (gid) for
+SPRITE_TILE_LAYERS = ['Bushes', 'Water Trays', 'Fence', 'House Walls', 'House Furniture Top']
+
+
+def level_source_files(path_to_tmx):
+    # The .tmx, every tileset it uses, and every image those tilesets use. Any of these changing changes the level
+
+    files = [path_to_tmx]
+
+    for tileset in ElementTree.parse(path_to_tmx).getroot().iter('tileset'):
+        if 'source' in tileset.attrib:
+            path_to_tsx = os.path.normpath(os.path.join(os.path.dirname(path_to_tmx), tileset.attrib['source']))
+            files.append(path_to_tsx)
+            for image in ElementTree.parse(path_to_tsx).getroot().iter('image'):
+                files.append(os.path.normpath(os.path.join(os.path.dirname(path_to_tsx), image.attrib['source'])))
+
+    return files
+
+
+def group_connected_tiles(tiles):
+    # Splits tile coordinates into groups of tiles touching each other, including diagonally
+
+    remaining = set(tiles)
+    groups = []
+    for tile in tiles:
+        if tile not in remaining:
+            continue
+        remaining.remove(tile)
+        group = []
+        to_visit = [tile]
+        while to_visit:
+            x, y = to_visit.pop()
+            group.append((x, y))
+            for neighbour in [(x + dx, y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]:
+                if neighbour in remaining:
+                    remaining.remove(neighbour)
+                    to_visit.append(neighbour)
+        groups.append(group)
+    return groups
+
+
+def merge_collision_tiles(collision_map):
+    # Greedily covers the collision tiles with as few rectangles as we can, each of tiles with the same shifts
+    # Each rectangle starts from the first uncovered tile (row by row), extends right as far as it can, then down as far
+    # as the whole width can. Returns (left, top, right, bottom, shift) in tile coordinates, right & bottom inclusive
+
+    def can_merge(x, y, shift):
+        return y < len(collision_map) and x < len(collision_map[y]) and collision_map[y][x]['has_tile'] and \
+            not covered[y][x] and collision_map[y][x] == shift
+
+    covered = [[False] * len(row) for row in collision_map]
+    rectangles = []
+
+    for top, row in enumerate(collision_map):
+        for left, shift in enumerate(row):
+            if not shift['has_tile'] or covered[top][left]:
+                continue
+
+            right = left
+            while can_merge(right + 1, top, shift):
+                right += 1
+
+            bottom = top
+            while all(can_merge(x, bottom + 1, shift) for x in range(left, right + 1)):
+                bottom += 1
+
+            for y in range(top, bottom + 1):
+                for x in range(left, right + 1):
+                    covered[y][x] = True
+
+            rectangles.append((left, top, right, bottom, shift))
+
+    return rectangles
+
+
+def level_hash(path_to_tmx):
+
+    sha = hashlib.sha1(('%s %s %s' % (COMPILED_LEVEL_VERSION, ZOOM_FACTOR, TILE_SIZE)).encode())
+    for path in level_source_files(path_to_tmx):
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def compile_level(path_to_tmx):
+    # Resolve everything Level.setup needs out of the Tiled map into plain data, which we can pickle
+    # Positions are in game pixels (already scaled by ZOOM_FACTOR), except where we say they're tile coordinates
+    # Graphics are stored once per gid as raw pixels, already scaled, noting if they need per-pixel alpha
+    # (pytmx only gives tiles per-pixel alpha if they use it, and those without are drawn fully opaque)
+
+    with trace_startup('load_pygame'):
+        tmx_data = load_pygame(path_to_tmx)
+
+    surfaces = {}
+
+    def store_surface(gid, surf):
+        if gid not in surfaces:
+            surf = pygame.transform.scale_by(surf, ZOOM_FACTOR)
+            surfaces[gid] = (surf.get_size(), pygame.image.tobytes(surf, 'RGBA'), bool(surf.get_flags() & pygame.SRCALPHA))
+        return gid
+
+    def layer_tiles(layer_name):
+        # Tile coordinates of every tile in the layer, with the gid of its graphic
+        return [(x, y, gid) for x, y, gid in tmx_data.get_layer_by_name(layer_name).iter_data() if gid]
+
+    level = {
+        'water': [(x, y) for x, y, _ in layer_tiles('Water')],
+        'tiles': {},
+        'normal trees': [(obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR) for obj in tmx_data.get_layer_by_name('Normal Trees')],
+        'beds': [],
+        'decoration top': [],
+        'boats': [
+            ((obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR), obj.properties['orientation'])
+            for obj in tmx_data.get_layer_by_name('Boats')
+        ],
+        'colliders': [],
+        'house tiles': [(x, y) for x, y, _ in layer_tiles('House Tiles')],
+        'buildings': [],
+        'pens': [],
+        'player start': None,
+        'weather floor invalid tiles': []
+    }
+
+    # Tile sprites
+    for layer_name in SPRITE_TILE_LAYERS:
+        with trace_startup(layer_name):
+            level['tiles'][layer_name] = [
+                (x, y, store_surface(gid, tmx_data.get_tile_image_by_gid(gid))) for x, y, gid in layer_tiles(layer_name)
+            ]
+
+    # Buildings: each connected group of roof tiles is one building's roof, over the house floor tiles under it
+    with trace_startup('Buildings'):
+        roof_gids = {(x, y): store_surface(gid, tmx_data.get_tile_image_by_gid(gid)) for x, y, gid in layer_tiles('House Roof')}
+        for roof_tiles in group_connected_tiles(list(roof_gids)):
+            left = min(x for x, y in roof_tiles)
+            right = max(x for x, y in roof_tiles)
+            top = min(y for x, y in roof_tiles)
+            bottom = max(y for x, y in roof_tiles)
+            level['buildings'].append({
+                'roof': [(x, y, roof_gids[(x, y)]) for x, y in sorted(roof_tiles, key=lambda tile: (tile[1], tile[0]))],
+                'floor': [(x, y) for x, y in level['house tiles'] if left <= x <= right and top <= y <= bottom]
+            })
+
+    # Object sprites
+    for obj in tmx_data.get_layer_by_name('House Furniture Interaction'):
+        if obj.name == 'Bed':
+            level['beds'].append(((obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR), store_surface(obj.gid, obj.image)))
+
+    for obj in tmx_data.get_layer_by_name('Decoration Top'):
+        level['decoration top'].append(((obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR), store_surface(obj.gid, obj.image)))
+
+    # Collisions
+    # There are 4 collision layers, depending on if we want to shift collision hitboxes, and these effects stack
+    # E.g. for corner of river we want to shift up/down AND left/right
+    # Build a mapping from tile index to a shift dictionary, then merge tiles with the same shifts into rectangles
+
+    with trace_startup('Collisions'):
+        collision_map = [
+            [{'has_tile': False, 'right': False, 'left': False, 'up': False, 'down': False} for col in range(TILES_WIDE)]
+            for row in range(TILE_HIGH)
+        ]
+
+        for layer in ['Collisions 1', 'Collisions 2', 'Collisions 3', 'Collisions 4']:
+            shift_direction = tmx_data.get_layer_by_name(layer).properties['shift']
+            for x, y, _ in layer_tiles(layer):
+                collision_map[y][x]['has_tile'] = True
+                collision_map[y][x][shift_direction] = True
+
+        level['colliders'] = merge_collision_tiles(collision_map)
+
+    # NPCs. Divided up into Pens, which have two relevant layers (walk area + NPC markers)
+
+    with trace_startup('Pens'):
+        pen_id_regex = regex.compile(r'^Pen ([0-9]+)$')
+        for layer in tmx_data.layernames:
+            regex_match = pen_id_regex.match(layer)
+            if regex_match is not None:
+                pen_id = regex_match.group(1)
+                level['pens'].append({
+                    'walk area': [(x, y) for x, y, _ in layer_tiles('Pen %s Walk Area' % pen_id)],
+                    'npcs': [
+                        {
+                            'pos': (obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR),
+                            'name': obj.name,
+                            'color': obj.properties['color'],
+                            'nickname': obj.properties['nickname']
+                        }
+                        for obj in tmx_data.get_layer_by_name('Pen %s NPCs' % pen_id)
+                    ]
+                })
+
+    # Player
+    for obj in tmx_data.get_layer_by_name('Player'):
+        if obj.name == 'Start':
+            level['player start'] = (obj.x*ZOOM_FACTOR, obj.y*ZOOM_FACTOR)
+
+    # Weather Floor Particle Positional Information
+    # All the tiles weather floor particles CANNOT land on, i.e. anything that isn't grass or bridge, or is house floor
+
+    with trace_startup('Weather floor positions'):
+        house_tiles = set(level['house tiles'])
+        valid_tiles = set()
+        for land_able_layer in ['Grass', 'Bridge']:
+            for x, y, _ in layer_tiles(land_able_layer):
+                if (x, y) not in house_tiles:
+                    valid_tiles.add((x, y))
+        level['weather floor invalid tiles'] = [
+            (x, y) for x in range(TILES_WIDE) for y in range(TILE_HIGH) if (x, y) not in valid_tiles
+        ]
+
+    level['surfaces'] = surfaces
+
+    return level
+
+
+def load_level(path_to_tmx):
+    # Returns the compiled level for the map, from the compiled level cache if it was compiled from the same files
+    # Otherwise compiles it & saves to the cache for next time
+    # The cache is only ever a shortcut: if it can't be read (corrupt, or from an incompatible Python) we compile as if
+    # it wasn't there, and if it can't be written (e.g. installed read-only) we just compile again next time
+
+    with trace_startup('Hash level sources'):
+        source_hash = level_hash(path_to_tmx)
+    path_to_compiled = os.path.splitext(path_to_tmx)[0] + COMPILED_LEVEL_EXTENSION
+
+    if os.path.exists(path_to_compiled):
+        with trace_startup('Read compiled level'):
+            compiled = read_compiled_level(path_to_compiled)
+        if compiled is not None and compiled[0] == source_hash:
+            return compiled[1]
+
+    with trace_startup('Compile level'):
+        level = compile_level(path_to_tmx)
+
+    try:
+        with open(path_to_compiled, 'wb') as f:
+            pickle.dump((source_hash, level), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+
+    return level
+
+
+def read_compiled_level(path_to_compiled):
+    # Returns (source hash, level) from the compiled level cache, or None if it can't be read
+    # Unpickling a damaged file can fail in many ways, these being the ones the pickle docs list besides its own error
+
+    try:
+        with open(path_to_compiled, 'rb') as f:
+            source_hash, level = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, TypeError, ValueError):
+        return None
+
+    return source_hash, level
@@ -2,25 +2,40 @@ import time
 import pygame
 from settings import *
 from level import Level
+from render_backend import create_render_backend
+from startup_trace import STARTUP_TRACER, trace_startup
+from instrumentation import FRAME_PROFILER, profile_scope
 
 
 class Game:
 
-    def __init__(self):
+    def __init__(self, headless=False, controls=None):
+        # Headless is for running without a real display (SDL's dummy video driver), e.g. benchmarks:
+        # no window scaling or vsync, and no custom cursor as the dummy driver doesn't support them
+        # Controls overrides where input is read from, see controls.py
 
         # Setup
-        pygame.init()
-        self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), flags=pygame.SCALED, vsync=1)
-        pygame.display.set_caption('Cup Nooble')
+        with trace_startup('pygame.init'):
+            pygame.init()
+        with trace_startup('display.set_mode'):
+            self.render_backend = create_render_backend(headless)
+        self.display_surface = self.render_backend.surface
+        self.render_backend.set_caption('Cup Nooble')
         self.clock = pygame.time.Clock()
 
         # Custom mouse cursor
-        mouse_surf = pygame.transform.scale_by(pygame.image.load('graphics/ui/mouse_icon.png').convert_alpha(), 1.5)
-        cursor = pygame.cursors.Cursor((5, 5), mouse_surf)
-        pygame.mouse.set_cursor(cursor)
+        if not headless:
+            with trace_startup('Mouse cursor'):
+                mouse_surf = pygame.transform.scale_by(pygame.image.load('graphics/ui/mouse_icon.png').convert_alpha(), 1.5)
+                cursor = pygame.cursors.Cursor((5, 5), mouse_surf)
+                pygame.mouse.set_cursor(cursor)
 
         # Create the level
-        self.level = Level()
+        with trace_startup('Level'):
+            self.level = Level(controls)
+
+        # Report where startup time went, if tracing
+        STARTUP_TRACER.finish()
 
     def run(self):
 
@@ -31,18 +46,27 @@ class Game:
             dt = time.time() - last_time
             last_time = time.time()
 
-            # Clear Frame
-            self.display_surface.fill('black')
-
-            # Run Level
-            self.level.run(dt)
-
-            # Update Display Surface
-            pygame.display.update()
+            self.frame(dt)
 
             # Limit Max Frame Rate
             self.clock.tick(FPS)
 
+    def frame(self, dt):
+
+        FRAME_PROFILER.begin_frame()
+
+        # Clear Frame
+        self.render_backend.begin_frame()
+
+        # Run Level
+        updated_rects = self.level.run(dt)
+
+        # Update Display Surface
+        with profile_scope('display.update'):
+            self.render_backend.present(updated_rects)
+
+        FRAME_PROFILER.end_frame()
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,215 @@
+import math
+import random
+import itertools
+import pygame
+from settings import *
+
+
+class PenNavigation:
+    # Where animals in a pen can walk to, worked out once when the level loads, so picking a target is a random choice
+    # The pen's walk area is tiles (shrunk so animals keep off the tile edges), and animals walk in a straight line from
+    # where they are to a random point in the walk area, which must be far enough away & clear of hitboxes
+    # The lines between two rects all lie in the rects' convex hull, so if that doesn't touch any hitbox, none do. For
+    # each pair of tiles we check that, and where it only holds for parts of them, split both into quarters & check
+    # those, down to cells NPC_WALK_CELL_SIZE across. Each cell then knows the rects it can always walk to
+    # Animals check lines from their interaction rect's center, so the lines are shifted by an offset per animal type,
+    # and the targets of each cell are worked out for each offset animals use (see prepare)
+
+    def __init__(self, walk_tiles, collision_sprites):
+
+        self.collision_sprites = collision_sprites
+        self.tile_rects = {}
+        for x, y in walk_tiles:
+            rect = pygame.Rect((x * TILE_SIZE, y * TILE_SIZE), (TILE_SIZE, TILE_SIZE))
+            self.tile_rects[(x, y)] = rect.inflate(-TILE_SIZE // 2, -TILE_SIZE // 2)
+        self.cells_across = TILE_SIZE // 2 // NPC_WALK_CELL_SIZE
+
+        # offset -> {(tile, cell x, cell y): (target rects, their cumulative areas, for picking one weighted by area)}
+        self.targets = {}
+
+    def prepare(self, offset):
+        # Works out the targets for an offset, if not already
+
+        offset = (offset[0], offset[1])
+        if offset in self.targets:
+            return
+
+        cell_targets = {
+            cell: [] for tile in self.tile_rects for cell in self.get_cells((tile, 0, 0, self.cells_across))
+        }
+
+        def add_targets(start, start_rect, target, target_rect):
+            # Every cell of the start area can walk to the whole target area, and (walking back) the other way round
+            for cell in self.get_cells(start):
+                cell_targets[cell].append(target_rect)
+            for cell in self.get_cells(target):
+                cell_targets[cell].append(start_rect)
+
+        def check(start, target, hitboxes):
+            # Areas are (tile, first cell x, first cell y, cells across). The hitboxes are those that might touch the
+            # hull between them: any touching the hull of a bigger pair of areas containing them
+            start_rect = self.get_area_rect(start)
+            target_rect = self.get_area_rect(target)
+            if not can_ever_be_far_enough(start_rect, target_rect):
+                return
+
+            if hitboxes:
+                hitboxes = get_hitboxes_touching_hull(start_rect, target_rect, offset, hitboxes)
+            if not hitboxes and is_far_enough(start_rect, target_rect):
+                add_targets(start, start_rect, target, target_rect)
+            elif start[3] > 1 and not (hitboxes and seems_blocked(start_rect, target_rect, offset, hitboxes)):
+                for start_quarter in get_area_quarters(start):
+                    for target_quarter in get_area_quarters(target):
+                        check(start_quarter, target_quarter, hitboxes)
+
+        # Lines stay within the walk area's bounding box, so only hitboxes touching that can get in the way
+        walk_rects = list(self.tile_rects.values())
+        area = walk_rects[0].unionall(walk_rects).move(offset).inflate(2, 2) if walk_rects else pygame.Rect(0, 0, 0, 0)
+        hitboxes = [sprite.hitbox for sprite in self.collision_sprites.query(area) if area.colliderect(sprite.hitbox)]
+
+        # Walking either way between two areas sweeps the same hull, so we check each pair of tiles once
+        tiles = list(self.tile_rects)
+        for index, tile in enumerate(tiles):
+            for target_tile in tiles[index + 1:]:
+                check((tile, 0, 0, self.cells_across), (target_tile, 0, 0, self.cells_across), hitboxes)
+
+        self.targets[offset] = {
+            cell: (tuple(targets), tuple(itertools.accumulate(rect.width * rect.height for rect in targets)))
+            for cell, targets in cell_targets.items() if targets
+        }
+
+    def get_area_rect(self, area):
+
+        tile, x, y, cells_across = area
+        rect = self.tile_rects[tile]
+        return pygame.Rect(
+            rect.left + x * NPC_WALK_CELL_SIZE,
+            rect.top + y * NPC_WALK_CELL_SIZE,
+            cells_across * NPC_WALK_CELL_SIZE,
+            cells_across * NPC_WALK_CELL_SIZE
+        )
+
+    def get_cells(self, area):
+
+        tile, x, y, cells_across = area
+        return [(tile, x + dx, y + dy) for dx in range(cells_across) for dy in range(cells_across)]
+
+    def get_cell(self, pos):
+        # The cell pos is in (edges included), or None if it's outside the walk area
+
+        tile = (int(pos[0] // TILE_SIZE), int(pos[1] // TILE_SIZE))
+        rect = self.tile_rects.get(tile)
+        if rect is None or not (rect.left <= pos[0] <= rect.right and rect.top <= pos[1] <= rect.bottom):
+            return None
+
+        last_cell = self.cells_across - 1
+        x = min(int((pos[0] - rect.left) // NPC_WALK_CELL_SIZE), last_cell)
+        y = min(int((pos[1] - rect.top) // NPC_WALK_CELL_SIZE), last_cell)
+        return tile, x, y
+
+    def pick_walk_target(self, pos, offset):
+        # A random point (weighted evenly over the area) an animal at pos can walk to, or None if there's nowhere
+        # Animals only stop at targets or where they were placed (see get_nearest_walk_point), both in the walk area
+
+        self.prepare(offset)
+        targets = self.targets[(offset[0], offset[1])].get(self.get_cell(pos))
+        if targets is None:
+            return None
+
+        rects, cumulative_areas = targets
+        rect = random.choices(rects, cum_weights=cumulative_areas)[0]
+        return pygame.math.Vector2(random.randint(rect.left, rect.right), random.randint(rect.top, rect.bottom))
+
+    def get_nearest_walk_point(self, pos, offset):
+        # Where to place an animal put down at pos, so it's somewhere in the walk area it can walk on from
+        # Cells share edges, which count as in the next cell along, so we keep off the far ones
+
+        self.prepare(offset)
+        cell_rects = [self.get_area_rect((*cell, 1)) for cell in self.targets[(offset[0], offset[1])]]
+        if not cell_rects:
+            return pygame.math.Vector2(pos)
+
+        def clamp(rect):
+            x = max(rect.left, min(pos[0], rect.right - 1))
+            y = max(rect.top, min(pos[1], rect.bottom - 1))
+            return pygame.math.Vector2(x, y)
+
+        return min((clamp(rect) for rect in cell_rects), key=lambda point: point.distance_squared_to(pos))
+
+
+def get_area_quarters(area):
+
+    tile, x, y, cells_across = area
+    half = cells_across // 2
+    return [(tile, x + dx, y + dy, half) for dx in (0, half) for dy in (0, half)]
+
+
+def is_far_enough(start_rect, target_rect):
+    # Whether the closest points in the two rects are at least NPC_MIN_WALK_DISTANCE apart
+
+    gap_x = max(0, target_rect.left - start_rect.right, start_rect.left - target_rect.right)
+    gap_y = max(0, target_rect.top - start_rect.bottom, start_rect.top - target_rect.bottom)
+    return math.hypot(gap_x, gap_y) >= NPC_MIN_WALK_DISTANCE
+
+
+def can_ever_be_far_enough(start_rect, target_rect):
+    # Whether the furthest apart points in the two rects are at least NPC_MIN_WALK_DISTANCE apart
+
+    span_x = max(target_rect.right - start_rect.left, start_rect.right - target_rect.left)
+    span_y = max(target_rect.bottom - start_rect.top, start_rect.bottom - target_rect.top)
+    return math.hypot(span_x, span_y) >= NPC_MIN_WALK_DISTANCE
+
+
+def get_hitboxes_touching_hull(start_rect, target_rect, offset, hitboxes):
+    # Those of the hitboxes touching the convex hull of the two rects (edges included, as points are picked with
+    # randint) once shifted by offset, which every line from a point in one rect to a point in the other lies in
+
+    start_rect = start_rect.move(offset)
+    target_rect = target_rect.move(offset)
+
+    # Only hitboxes touching the hull's bounding box can touch the hull
+    area = start_rect.union(target_rect).inflate(2, 2)
+    return [
+        hitboxes[index] for index in area.collidelistall(hitboxes)
+        if hull_touches_rect(start_rect, target_rect, hitboxes[index])
+    ]
+
+
+def seems_blocked(start_rect, target_rect, offset, hitboxes):
+    # Whether the line between the rects' centers & those between their matching corners all touch hitboxes, in which
+    # case few if any lines between them are clear, and we don't look into which
+
+    lines = [(start_rect.center, target_rect.center)] + [
+        (getattr(start_rect, corner), getattr(target_rect, corner))
+        for corner in ('topleft', 'topright', 'bottomleft', 'bottomright')
+    ]
+    for start, end in lines:
+        start = pygame.Rect(start, (0, 0)).move(offset)
+        end = pygame.Rect(end, (0, 0)).move(offset)
+        if not any(hull_touches_rect(start, end, hitbox) for hitbox in hitboxes):
+            return False
+    return True
+
+
+def hull_touches_rect(start_rect, target_rect, rect):
+    # Whether the convex hull of two rects touches a third, counting just touching as touching
+    # The hull is every rect in between the two, (1 - t) * start_rect + t * target_rect for t from 0 to 1, so it touches
+    # rect if one of those does. Each side of that is a limit on t, so we narrow down the range of t meeting them all
+
+    lowest, highest = 0, 1
+    for start, target, limit in (
+        (start_rect.left, target_rect.left, rect.right),  # Left side no further right than rect's right
+        (-start_rect.right, -target_rect.right, -rect.left),  # Right side no further left than rect's left
+        (start_rect.top, target_rect.top, rect.bottom),
+        (-start_rect.bottom, -target_rect.bottom, -rect.top)
+    ):
+        # start + (target - start) * t <= limit
+        slope = target - start
+        if slope > 0:
+            highest = min(highest, (limit - start) / slope)
+        elif slope < 0:
+            lowest = max(lowest, (limit - start) / slope)
+        elif start > limit:
+            return False
+
+    return lowest <= highest
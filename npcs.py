@@ -8,7 +8,7 @@ from pygame.math import Vector2
 
 class Animal(pygame.sprite.Sprite):
 
-    def __init__(self, pos, frames, name, walk_area, collision_sprites, groups):
+    def __init__(self, pos, frames, name, navigation, collision_sprites, groups):
 
         super().__init__(groups)
 
@@ -27,6 +27,12 @@ class Animal(pygame.sprite.Sprite):
         self.interaction_rect = self.rect.inflate(0, -self.rect.height * 0.4)
         self.interaction_rect.midbottom = self.rect.midbottom
 
+        # Walk lines are checked from our interaction rect's center, this far from our position
+        # We're placed in our pen's walk area, as only from there do we know where we can walk to (see PenNavigation)
+        self.walk_offset = Vector2(self.interaction_rect.center) - self.rect.center
+        self.rect.center = navigation.get_nearest_walk_point(pos, self.walk_offset)
+        self.interaction_rect.midbottom = self.rect.midbottom
+
         # Float-based movement
         # Target position and direction will be non-None when status is running
         self.pos = Vector2(self.rect.center)
@@ -35,7 +41,7 @@ class Animal(pygame.sprite.Sprite):
 
         # Extra attributes
         self.name = name
-        self.walk_area = walk_area
+        self.navigation = navigation
         self.collision_sprites = collision_sprites
 
         # Love hearts
@@ -58,28 +64,22 @@ class Animal(pygame.sprite.Sprite):
         self.love_timer.activate()
 
     def pick_new_walk_location(self):
-        # Called when we enter the run state, to know where we are running to
-        # Keep picking randomly until at least 3 tiles away and would not lead us to collide with anything along
-        # the line from current center (interaction rect) to final position
-
-        picked_new_pos = False
-        while not picked_new_pos:
-            random_tile = random.choice(self.walk_area)
-            random_x = random.randint(random_tile.left, random_tile.right)
-            random_y = random.randint(random_tile.top, random_tile.bottom)
-            if distance_between_vectors((random_x, random_y), self.pos) < 3 * TILE_SIZE:
-                continue
-            if collide_line(self.pos, (random_x, random_y), self.collision_sprites, offset=Vector2(self.interaction_rect.center)-self.pos):
-                continue
-            picked_new_pos = True
-
-        if random_x < self.pos.x:
+        # Called when we want to enter the run state, to know where we are running to. Returns whether we found anywhere
+        # It must be at least NPC_MIN_WALK_DISTANCE away and not lead us to collide with anything along the line from
+        # current center (interaction rect) to final position. Our pen's navigation knows where that holds from here
+
+        target_pos = self.navigation.pick_walk_target(self.pos, self.walk_offset)
+        if target_pos is None:
+            return False
+
+        if target_pos.x < self.pos.x:
             self.facing = 'left'
         else:
             self.facing = 'right'
 
-        self.target_pos = Vector2(random_x, random_y)
+        self.target_pos = target_pos
         self.direction = (self.target_pos - self.pos).normalize()
+        return True
 
     def animate(self, dt):
 
@@ -95,18 +95,29 @@ class Animal(pygame.sprite.Sprite):
 
         if self.is_running():
 
-            self.pos += self.direction * self.speed * dt
+            # Our walk target was picked with a clear line from our interaction rect's center, so sweep that point along
+            # the movement too, in case anything has got in the way since (or a long frame would carry us past it)
+            center = self.pos + Vector2(self.interaction_rect.center) - self.rect.center
+            moved, blocked = self.collision_sprites.sweep((center.x, center.y, 0, 0), self.direction * self.speed * dt)
+            self.pos += moved
             self.rect.center = (round(self.pos.x), round(self.pos.y))
             self.interaction_rect.midbottom = self.rect.midbottom
 
-            if distance_between_vectors(self.target_pos, self.pos) < TILE_SIZE / 20:
+            if blocked:
+                self.stop_running()
+
+            elif distance_between_vectors(self.target_pos, self.pos) < TILE_SIZE / 20:
                 self.pos = self.target_pos
                 self.rect.center = self.target_pos
                 self.interaction_rect.midbottom = self.rect.midbottom
-                self.direction = None
-                self.target_pos = None
-                self.frame_index = 0
-                self.status = 'idle'
+                self.stop_running()
+
+    def stop_running(self):
+
+        self.direction = None
+        self.target_pos = None
+        self.frame_index = 0
+        self.status = 'idle'
 
     def update(self, dt):
 
@@ -117,9 +128,9 @@ class Animal(pygame.sprite.Sprite):
 
 class Chicken(Animal):
 
-    def __init__(self, pos, frames, name, walk_area, collision_sprites, groups):
+    def __init__(self, pos, frames, name, navigation, collision_sprites, groups):
 
-        super().__init__(pos, frames, name, walk_area, collision_sprites, groups)
+        super().__init__(pos, frames, name, navigation, collision_sprites, groups)
 
         self.speed = 100
 
@@ -132,8 +143,7 @@ class Chicken(Animal):
             if chance < 2:
                 self.status = 'peck'
             elif chance == 2:
-                self.pick_new_walk_location()
-                self.status = 'run'
+                self.status = 'run' if self.pick_new_walk_location() else 'idle'
             else:
                 self.status = 'idle'
 
@@ -190,9 +200,9 @@ class Chicken(Animal):
 
 class Cow(Animal):
 
-    def __init__(self, pos, frames, name, walk_area, collision_sprites, groups):
+    def __init__(self, pos, frames, name, navigation, collision_sprites, groups):
 
-        super().__init__(pos, frames, name, walk_area, collision_sprites, groups)
+        super().__init__(pos, frames, name, navigation, collision_sprites, groups)
 
         self.speed = 75
 
@@ -205,8 +215,7 @@ class Cow(Animal):
             if chance < 2:
                 self.status = 'graze'
             elif chance == 2:
-                self.pick_new_walk_location()
-                self.status = 'run'
+                self.status = 'run' if self.pick_new_walk_location() else 'idle'
             elif 3 <= chance <= 4:
                 self.status = 'rest'
             else:
@@ -0,0 +1,23 @@
+import pygame
+from settings import *
+
+
+class MultiplyOverlay:
+    # Darkens the screen by multiplying it with a grey level (0-255), e.g. for the sky luminance or fading to black
+    # Blits a surface filled with the grey, as that's far quicker than a fill with a blend flag, and only refills it when
+    # the grey level changes. Does nothing at 255, where the multiply wouldn't change anything
+
+    def __init__(self, size=(WINDOW_WIDTH, WINDOW_HEIGHT)):
+
+        self.image = pygame.Surface(size)
+        self.lum = None  # Grey level the image is currently filled with
+
+    def display(self, surface, lum):
+
+        if lum >= 255:
+            return
+
+        if lum != self.lum:
+            self.image.fill((lum, lum, lum))
+            self.lum = lum
+        surface.blit(self.image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
@@ -2,6 +2,7 @@ import pygame
 from util import *
 from settings import *
 from skills import Skills
+from atlas import FRAME_ATLAS
 from pygame.math import Vector2
 from sprites import WateringCanParticleEffect
 
@@ -10,7 +11,7 @@ class Player(pygame.sprite.Sprite):
 
     # SETUP
 
-    def __init__(self, pos, house_floor_sprites, collision_sprites, tree_sprites, all_sprites, is_transition_active, is_ui_active, disable_uis, groups):
+    def __init__(self, pos, house_floor_sprites, collision_sprites, tree_sprites, all_sprites, is_transition_active, is_ui_active, disable_uis, controls, groups):
 
         super().__init__(groups)
 
@@ -53,15 +54,23 @@ class Player(pygame.sprite.Sprite):
         # (More specifically soft parts of UI, as couldn't start a tool action & disable if one was active anyway)
         self.disable_uis = disable_uis
 
+        # Where we read the keyboard from
+        self.controls = controls
+
         # Skills
         self.skills = Skills()
 
     def import_assets(self):
 
-        self.frames = import_folders_as_lists('graphics/player')
+        assets = FRAME_ATLAS.pack(import_assets({
+            'frames': folders_as_lists_asset('graphics/player'),
+            'watering particles': folders_as_lists_asset('graphics/particles/player/watering')
+        }))
+
+        self.frames = assets['frames']
 
         self.assets = {
-            'watering particles': import_folders_as_lists('graphics/particles/player/watering')
+            'watering particles': assets['watering particles']
         }
 
     # SUPPORT
@@ -123,7 +132,7 @@ class Player(pygame.sprite.Sprite):
 
         elif not self.is_tool_use_active():
 
-            keys = pygame.key.get_pressed()
+            keys = self.controls.get_pressed()
 
             if keys[pygame.K_RIGHT]:
                 self.direction.x = 1
@@ -162,18 +171,23 @@ class Player(pygame.sprite.Sprite):
         if self.direction.magnitude() > 0:
             self.direction = self.direction.normalize()
 
-        # Horizontal Movement
-        self.pos.x += self.direction.x * self.speed * dt
-        self.hitbox.centerx = round(self.pos.x)
-        self.rect.centerx = self.hitbox.centerx
-        self.collision('x')
-        self.game_border_restrict('x')
+        # Sweep our hitbox from our float position along this frame's movement, so it stops at (and slides along)
+        # whatever is in the way rather than passing through it, however far we move in one frame
+        box = (
+            self.pos.x - (self.hitbox.centerx - self.hitbox.left), self.pos.y - (self.hitbox.centery - self.hitbox.top),
+            self.hitbox.width, self.hitbox.height
+        )
+        moved, blocked = self.collision_sprites.sweep(box, self.direction * self.speed * dt)
+        self.pos += moved
+        self.hitbox.center = (round(self.pos.x), round(self.pos.y))
+        self.rect.center = self.hitbox.center
 
-        # Vertical Movement
-        self.pos.y += self.direction.y * self.speed * dt
-        self.hitbox.centery = round(self.pos.y)
-        self.rect.centery = self.hitbox.centery
+        # The sweep only stops us entering hitboxes, so if we were already inside one (e.g. a stump grew back into a
+        # tree around us), push out of it as we always have
+        self.collision('x')
         self.collision('y')
+
+        self.game_border_restrict('x')
         self.game_border_restrict('y')
 
     def game_border_restrict(self, axis):
@@ -206,32 +220,30 @@ class Player(pygame.sprite.Sprite):
     def collision(self, axis):
         # Handle collisions between our hitbox and any hitboxes of sprites we deem as collideable
 
-        for sprite in self.collision_sprites.sprites():
-            if sprite.hitbox.colliderect(self.hitbox):
-
-                if axis == 'x':
+        for sprite in self.collision_sprites.colliding(self.hitbox):
+            if axis == 'x':
 
-                    if self.direction.x > 0:
-                        self.hitbox.right = sprite.hitbox.left
-                        self.rect.centerx = self.hitbox.centerx
-                        self.pos.x = self.hitbox.centerx
+                if self.direction.x > 0:
+                    self.hitbox.right = sprite.hitbox.left
+                    self.rect.centerx = self.hitbox.centerx
+                    self.pos.x = self.hitbox.centerx
 
-                    elif self.direction.x < 0:
-                        self.hitbox.left = sprite.hitbox.right
-                        self.rect.centerx = self.hitbox.centerx
-                        self.pos.x = self.hitbox.centerx
+                elif self.direction.x < 0:
+                    self.hitbox.left = sprite.hitbox.right
+                    self.rect.centerx = self.hitbox.centerx
+                    self.pos.x = self.hitbox.centerx
 
-                elif axis == 'y':
+            elif axis == 'y':
 
-                    if self.direction.y > 0:
-                        self.hitbox.bottom = sprite.hitbox.top
-                        self.rect.centery = self.hitbox.centery
-                        self.pos.y = self.hitbox.centery
+                if self.direction.y > 0:
+                    self.hitbox.bottom = sprite.hitbox.top
+                    self.rect.centery = self.hitbox.centery
+                    self.pos.y = self.hitbox.centery
 
-                    elif self.direction.y < 0:
-                        self.hitbox.top = sprite.hitbox.bottom
-                        self.rect.centery = self.hitbox.centery
-                        self.pos.y = self.hitbox.centery
+                elif self.direction.y < 0:
+                    self.hitbox.top = sprite.hitbox.bottom
+                    self.rect.centery = self.hitbox.centery
+                    self.pos.y = self.hitbox.centery
 
     def teleport(self, coordinate):
 
@@ -0,0 +1,213 @@
+import weakref
+import pygame
+from settings import *
+from pygame._sdl2.video import Window, Renderer, Texture
+from overlay import MultiplyOverlay
+from atlas import FRAME_ATLAS
+from util import merge_rects
+
+
+# What the game draws with. Everything draws through the backend Game sets up (see get_render_backend):
+# the camera draws the world with blit_sequence, the sky, thunder & transitions use fill & multiply, and everything
+# else (UIs, debug, cutscenes) draws onto the backend's surface with normal pygame drawing, then tells the backend
+# where with mark_overlay_drawn
+# Which backend is picked by RENDER_BACKEND in settings
+
+
+def blit_sequence(surface, sequence):
+    # Blit (image, position) pairs in one call rather than one Python call each, which for many small sprites costs
+    # more than the blitting itself. pygame-ce's fblits is quickest, as it doesn't even build the list of rects blits can
+
+    if HAS_FBLITS:
+        surface.fblits(sequence)
+    else:
+        surface.blits(sequence, doreturn=False)
+
+
+HAS_FBLITS = hasattr(pygame.Surface, 'fblits')
+
+
+class SurfaceBackend:
+    # Software drawing straight onto a surface, normally the display surface from pygame.display.set_mode
+
+    # Whether the world is drawn onto the surface, which the camera's dirty rect mode relies on
+    draws_world_to_surface = True
+
+    def __init__(self, surface):
+
+        self.surface = surface
+        self.overlay = MultiplyOverlay(surface.get_size())
+
+    @classmethod
+    def from_display(cls, headless):
+
+        return cls(pygame.display.set_mode(
+            (WINDOW_WIDTH, WINDOW_HEIGHT), flags=0 if headless else pygame.SCALED, vsync=0 if headless else 1
+        ))
+
+    def set_caption(self, caption):
+
+        pygame.display.set_caption(caption)
+
+    def begin_frame(self):
+        # Clear the frame (unless only redrawing what changed, in which case the camera clears what it redraws)
+
+        if not DIRTY_RECTS['enabled']:
+            self.surface.fill('black')
+
+    def blit_sequence(self, sequence):
+
+        blit_sequence(self.surface, sequence)
+
+    def fill(self, color):
+
+        self.surface.fill(color)
+
+    def multiply(self, lum):
+
+        self.overlay.display(self.surface, lum)
+
+    def mark_overlay_drawn(self, rects):
+
+        pass
+
+    def present(self, updated_rects=None):
+
+        if updated_rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(updated_rects)
+
+
+class RendererBackend:
+    # Draws with an SDL renderer (pygame._sdl2.video), so the world is composited from textures rather than CPU blits
+    # Each image is uploaded as a texture the first time it's drawn, and the texture dropped along with the image, so
+    # images must not be changed once drawn (as none of our sprites' are). Frames in the texture atlas are drawn as
+    # areas of one texture per atlas page instead, which the atlas tells us to upload again whenever the page changes
+    # The surface is a transparent overlay for everything drawn with normal pygame drawing, of which just the areas
+    # marked drawn are uploaded & drawn over the world before the next fill, multiply or present
+    # Headless uses SDL's software renderer, which works without a GPU on SDL's dummy video driver
+
+    draws_world_to_surface = False
+
+    def __init__(self, headless):
+
+        # Images are still loaded with convert & convert_alpha, which need the display module to have a video mode
+        pygame.display.set_mode((1, 1), flags=pygame.HIDDEN)
+
+        self.window = Window(size=(WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.renderer = Renderer(self.window, accelerated=0 if headless else -1, vsync=not headless)
+        self.textures = weakref.WeakKeyDictionary()  # Image or atlas page -> texture
+        self.atlas_areas = weakref.WeakKeyDictionary()  # Image -> (atlas page, area of the page it is), or Nones
+        FRAME_ATLAS.page_change_listeners.append(self.forget_texture)
+
+        self.surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
+        self.overlay_texture = Texture(self.renderer, (WINDOW_WIDTH, WINDOW_HEIGHT), streaming=True)
+        self.overlay_texture.blend_mode = RENDERER_BLEND_MODES['blend']
+        self.overlay_rects = []
+
+    def set_caption(self, caption):
+
+        self.window.title = caption
+
+    def get_texture(self, image):
+        # Returns the texture to draw an image from, and the area of it the image is (None for all of it)
+
+        atlas_area = self.atlas_areas.get(image)
+        if atlas_area is None:
+            if FRAME_ATLAS.owns(image):
+                atlas_area = image.get_parent(), pygame.Rect(image.get_offset(), image.get_size())
+            else:
+                atlas_area = None, None
+            self.atlas_areas[image] = atlas_area
+
+        page, area = atlas_area
+        if page is not None:
+            image = page
+
+        texture = self.textures.get(image)
+        if texture is None:
+            texture = Texture.from_surface(self.renderer, image)
+            self.textures[image] = texture
+        return texture, area
+
+    def forget_texture(self, image):
+
+        self.textures.pop(image, None)
+
+    def begin_frame(self):
+
+        self.renderer.draw_color = (0, 0, 0, 255)
+        self.renderer.clear()
+
+    def blit_sequence(self, sequence):
+
+        get_texture = self.get_texture
+        for image, pos in sequence:
+            texture, area = get_texture(image)
+            # Without a size, textures draw at their full size, which for atlas frames would be the whole page's
+            texture.draw(srcrect=area, dstrect=(pos, area.size) if area else pos)
+
+    def fill(self, color):
+
+        self.draw_overlay()
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.clear()
+
+    def multiply(self, lum):
+
+        if lum >= 255:
+            return
+
+        self.draw_overlay()
+        self.renderer.draw_blend_mode = RENDERER_BLEND_MODES['multiply']
+        self.renderer.draw_color = (lum, lum, lum, 255)
+        self.renderer.fill_rect((0, 0, WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.renderer.draw_blend_mode = RENDERER_BLEND_MODES['none']
+
+    def mark_overlay_drawn(self, rects):
+        # Areas of the surface drawn on since the overlay was last drawn
+
+        self.overlay_rects.extend(rects)
+
+    def draw_overlay(self):
+        # Whatever has been drawn onto the surface goes over the world, and the surface is cleared for more
+        # Overlapping areas are merged, as drawing any part twice would blend it in twice
+
+        screen_rect = self.surface.get_rect()
+        for rect in merge_rects([rect.clip(screen_rect) for rect in self.overlay_rects if rect.colliderect(screen_rect)]):
+            self.overlay_texture.update(self.surface.subsurface(rect), rect)
+            self.overlay_texture.draw(srcrect=rect, dstrect=rect)
+            self.surface.fill((0, 0, 0, 0), rect)
+        self.overlay_rects = []
+
+    def present(self, updated_rects=None):
+        # The whole frame is redrawn each time, so updated rects don't matter
+
+        self.draw_overlay()
+        self.renderer.present()
+
+
+# SDL_BlendMode values
+RENDERER_BLEND_MODES = {'none': 0, 'blend': 1, 'multiply': 4}
+
+
+# BACKEND IN USE
+
+render_backend = None
+
+
+def get_render_backend():
+
+    return render_backend
+
+
+def create_render_backend(headless):
+    # Sets up the display with the backend picked in settings, and makes it the one get_render_backend returns
+
+    global render_backend
+    if RENDER_BACKEND['type'] == 'renderer':
+        render_backend = RendererBackend(headless)
+    else:
+        render_backend = SurfaceBackend.from_display(headless)
+    return render_backend
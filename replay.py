@@ -0,0 +1,265 @@
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import pygame
+from settings import *
+from controls import Controls, PressedKeys
+from timers import set_tick_source
+from util import percentile
+from main import Game
+
+
+# Record a play session's input & randomness, and replay it exactly, for comparing performance of engine changes
+# Each frame we store: dt, the seed the RNG was reseeded with, which of the watched keys were held, the mouse position,
+# the events the game reacts to, and a hash of the game state after the frame
+# Replaying feeds all of that back into Level.run, and checks the state hash every frame to catch any divergence
+# Usage: python replay.py record [path] [--seed N]
+#        python replay.py play [path] [--headless]
+
+REPLAY_VERSION = 1
+REPLAY_DEFAULT_PATH = 'session.replay'
+REPLAY_WATCHED_KEYS = [
+    pygame.K_RIGHT, pygame.K_LEFT, pygame.K_UP, pygame.K_DOWN, pygame.K_LSHIFT, *PLAYER_TOOL_ACTION_KEY_MAP.keys()
+]
+
+
+class FrameControls(Controls):
+    # Input snapshot that stays the same for the whole frame, however many times it is read
+
+    def __init__(self):
+
+        self.pressed = PressedKeys()
+        self.events = []
+        self.mouse_pos = (0, 0)
+
+    def get_events(self):
+
+        events, self.events = self.events, []
+        return events
+
+    def get_pressed(self):
+
+        return self.pressed
+
+    def get_mouse_pos(self):
+
+        return self.mouse_pos
+
+
+class RecordingControls(FrameControls):
+    # Takes the snapshot from pygame, and also returns it in the compact form we store
+
+    def __init__(self):
+
+        super().__init__()
+
+        self.quit = False
+
+    def snapshot(self):
+
+        keys = pygame.key.get_pressed()
+        pressed = [key for key in REPLAY_WATCHED_KEYS if keys[key]]
+        self.pressed = PressedKeys(pressed)
+        self.mouse_pos = pygame.mouse.get_pos()
+
+        self.events = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                # Recorder handles quitting, so the session gets saved
+                self.quit = True
+            elif event.type in [pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN]:
+                self.events.append(event)
+
+        return encode_keys(pressed), list(self.mouse_pos), [encode_event(e) for e in self.events]
+
+
+class ReplayControls(FrameControls):
+    # Takes the snapshot from a recorded frame
+
+    def load(self, keys, mouse_pos, events):
+
+        self.pressed = PressedKeys(decode_keys(keys))
+        self.mouse_pos = tuple(mouse_pos)
+        self.events = [decode_event(e) for e in events]
+
+
+class Session:
+    # Shared setup for recording & replaying: simulated clock & seeding, so both see exactly the same game
+
+    def __init__(self, controls, seed, headless=False):
+
+        # Game time is the sum of the frames' dt, rather than the real clock, so timers fire on the same frame in replay
+        self.ticks = 0
+        set_tick_source(lambda: self.ticks)
+        random.seed(seed)
+
+        self.controls = controls
+        self.game = Game(headless=headless, controls=controls)
+        self.level = self.game.level
+
+    def frame(self, dt, seed):
+        # Reseeding every frame keeps a change in how many random numbers one frame uses from shifting every later frame
+
+        random.seed(seed)
+        self.game.frame(dt)
+        self.ticks += dt * 1000
+
+        return state_hash(self.level)
+
+    def close(self):
+
+        set_tick_source(None)
+
+
+def record(path, seed):
+
+    controls = RecordingControls()
+    session = Session(controls, seed)
+    frame_seeds = random.Random(seed)
+
+    frames = []
+    last_time = time.time()
+    while True:
+
+        dt = time.time() - last_time
+        last_time = time.time()
+
+        keys, mouse_pos, events = controls.snapshot()
+        if controls.quit:
+            break
+
+        frame_seed = frame_seeds.getrandbits(32)
+        frames.append([dt, frame_seed, keys, mouse_pos, events, session.frame(dt, frame_seed)])
+
+        session.game.clock.tick(FPS)
+
+    session.close()
+    pygame.quit()
+
+    save_replay(path, {'version': REPLAY_VERSION, 'seed': seed, 'keys': REPLAY_WATCHED_KEYS, 'frames': frames})
+    print(f'Recorded {len(frames)} frames to {path}')
+
+
+def play(path, headless):
+
+    replay = load_replay(path)
+
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    controls = ReplayControls()
+    session = Session(controls, replay['seed'], headless=headless)
+
+    frame_times = []
+    diverged_at = None
+    for index, (dt, frame_seed, keys, mouse_pos, events, expected_hash) in enumerate(replay['frames']):
+
+        controls.load(keys, mouse_pos, events)
+
+        start = time.perf_counter()
+        frame_hash = session.frame(dt, frame_seed)
+        frame_times.append(time.perf_counter() - start)
+
+        if frame_hash != expected_hash:
+            diverged_at = index
+            break
+
+    session.close()
+
+    frame_times.sort()
+    print(f'Replayed {len(frame_times)} of {len(replay["frames"])} frames, frame time (ms): ' + ', '.join(
+        f'p{p} {percentile(frame_times, p) * 1000:.2f}' for p in [50, 95, 99]
+    ) + f', max {frame_times[-1] * 1000:.2f}')
+
+    if diverged_at is not None:
+        print(f'Replay diverged from the recording at frame {diverged_at}', file=sys.stderr)
+        return False
+    return True
+
+
+# FILE FORMAT
+
+def save_replay(path, replay):
+
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(replay, f, separators=(',', ':'))
+
+
+def load_replay(path):
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        replay = json.load(f)
+
+    if replay['version'] != REPLAY_VERSION or replay['keys'] != REPLAY_WATCHED_KEYS:
+        raise ValueError(f'{path} was recorded with a different version of the replay format')
+
+    return replay
+
+
+def encode_keys(pressed):
+    # Bitmask over REPLAY_WATCHED_KEYS
+
+    return sum(1 << REPLAY_WATCHED_KEYS.index(key) for key in pressed)
+
+
+def decode_keys(bitmask):
+
+    return [key for i, key in enumerate(REPLAY_WATCHED_KEYS) if bitmask & (1 << i)]
+
+
+def encode_event(event):
+    # Only the attributes the game reads
+
+    if event.type == pygame.KEYDOWN:
+        return ['key', event.key]
+    else:
+        return ['mouse', event.button, list(event.pos)]
+
+
+def decode_event(event):
+
+    if event[0] == 'key':
+        return pygame.event.Event(pygame.KEYDOWN, key=event[1])
+    else:
+        return pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=event[1], pos=tuple(event[2]))
+
+
+# STATE HASH
+
+def state_hash(level):
+    # Short hash of the game state that input & randomness affect, to compare recording & replay frame by frame
+
+    day = level.day
+    player = level.player
+
+    state = (
+        (day.day, day.current_time, day.temp, day.weather_type),
+        (player.pos.x, player.pos.y, player.status, tuple(player.skills.get_xp(s) for s in player.skills.all_skills)),
+        tuple((animal.pos.x, animal.pos.y, animal.status, animal.love_hearts) for animal in level.animal_sprites.sprites()),
+        tuple((tree.status, tree.health) for tree in level.tree_sprites.sprites()),
+        tuple(t.active for t in level.all_transitions),
+        len(level.day.weather_falling_particles), len(level.day.weather_floor_particles)
+    )
+
+    return hashlib.blake2b(repr(state).encode(), digest_size=8).hexdigest()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Record or replay a play session')
+    parser.add_argument('mode', choices=['record', 'play'])
+    parser.add_argument('path', nargs='?', default=REPLAY_DEFAULT_PATH)
+    parser.add_argument('--seed', type=int, default=0, help='RNG seed when recording')
+    parser.add_argument('--headless', action='store_true', help='replay without a window, e.g. for benchmarking')
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        record(args.path, args.seed)
+    else:
+        sys.exit(0 if play(args.path, args.headless) else 1)
@@ -12,6 +12,22 @@ TILES_WIDE, TILE_HIGH = 50, 50
 FPS = 60  # Max frame rate
 GAME_WIDTH = TILE_SIZE * TILES_WIDE
 GAME_HEIGHT = TILE_SIZE * TILE_HIGH
+ASSET_CACHE_MAX_UNUSED = 64  # Imported surfaces nothing references any more that we keep around in case they're re-imported
+
+ASSET_LOADER_THREADS = None  # Threads decoding images at startup. None lets Python pick from the number of CPUs
+ATLAS_PAGE_SIZE = 2048  # Width & height of the surfaces animation frames are packed into
+CUTSCENE_BUFFERED_FRAMES = 30  # Full-screen cutscene frames decoded ahead of the one playing, streamed from disk
+CAMERA_GRID_CELL_SIZE = TILE_SIZE * 4  # Cells of the spatial index the camera finds on screen sprites with
+CAMERA_CULL_MARGIN = TILE_SIZE  # Sprites this far off screen are still drawn, in case an image overhangs its rect
+COLLISION_GRID_CELL_SIZE = TILE_SIZE  # Cells of the spatial hash collision sprites are bucketed into by hitbox
+TILE_LAYER_CHUNK_SIZE = TILE_SIZE * 4  # Width & height of the chunks the ground & water layers are baked into
+NPC_MIN_WALK_DISTANCE = TILE_SIZE * 3  # Animals only set off for somewhere at least this far away
+NPC_WALK_CELL_SIZE = TILE_SIZE // 4  # Smallest area animal walks are checked between (see PenNavigation)
+
+ASSET_PACK = {
+    # Prebuilt file of raw, already scaled pixel buffers for every image the game imports. Build: python support.py pack
+    'path': 'data/graphics.pack'
+}
 
 
 Z_LAYERS = {
@@ -142,9 +158,36 @@ WEATHER_THUNDER = {
 # Ensures a good gap between thunder stopping & starting again
 assert WEATHER_THUNDER['duration'] * 2 < WEATHER_THUNDER['frequency']['min']
 
+STARTUP_TRACE = {
+    # Time each phase of starting up, printing a report & saving it as JSON, to compare between builds
+    'enabled': False,
+    'json path': 'startup_trace.json'
+}
+
+DIRTY_RECTS = {
+    # Only redraw & update the parts of the screen that changed since last frame, for when little is moving
+    # Falls back to redrawing everything when the camera moves, the sky changes, or more than this fraction changed
+    'enabled': False,
+    'max screen fraction': 0.5
+}
+
+RENDER_BACKEND = {
+    # What draws the game (see render_backend.py): 'surface' draws in software onto the display surface, 'renderer'
+    # composites textures with an SDL renderer. The renderer always redraws everything, so ignores the two options below
+    'type': 'surface'
+}
+
+FRAME_PROFILE = {
+    # Time each stage of every frame (see instrumentation.py), keeping this many of the latest frames
+    # Also turned on by the frame profile debug option, which draws them as a bar chart
+    'enabled': False,
+    'history': 240
+}
+
 DEBUG = False
 DEBUG_OPTIONS = {
     'fps': True,
+    'frame profile': True,
     'player': {
         'rect': True,
         'hitbox': True,
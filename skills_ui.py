@@ -1,6 +1,7 @@
 import pygame
 from util import *
 from settings import *
+from render_backend import get_render_backend
 
 
 class SkillsUI:
@@ -10,7 +11,7 @@ class SkillsUI:
     def __init__(self, skills):
 
         self.import_assets()
-        self.display_surface = pygame.display.get_surface()
+        self.display_surface = get_render_backend().surface
         self.debug_string = 'Skills UI'
         self.font = pygame.font.Font('graphics/font/sproutLands.ttf', 16)
         self.skills = skills
@@ -20,11 +21,11 @@ class SkillsUI:
 
     def import_assets(self):
 
-        self.assets = {
-            'icons': import_folder_as_dict('graphics/ui/skills/icons/', scale=False),
-            'buttons': import_folder_as_dict('graphics/ui/skills/buttons/', scale=False),
-            'interface': import_image('graphics/ui/skills/interface.png', scale=False)
-        }
+        self.assets = import_assets({
+            'icons': folder_as_dict_asset('graphics/ui/skills/icons/', scale=False),
+            'buttons': folder_as_dict_asset('graphics/ui/skills/buttons/', scale=False),
+            'interface': image_asset('graphics/ui/skills/interface.png', scale=False)
+        })
 
         self.button_rect = self.assets['buttons']['open'].get_rect(bottomleft=UI_POSITIONING['skills']['offset'])
         self.interface_rect = self.assets['interface'].get_rect(bottomleft=self.button_rect.topleft - Vector2(0, 5))
@@ -89,14 +90,17 @@ class SkillsUI:
         return skill_interface
 
     def display(self, camera_offset):
+        # Returns the rects drawn on screen
 
         if self.is_active():
 
-            self.display_surface.blit(self.assets['buttons']['open'], self.button_rect)
-
             skills_surf = self.build_skills_surf()
-            self.display_surface.blit(skills_surf, self.interface_rect)
+
+            return [
+                self.display_surface.blit(self.assets['buttons']['open'], self.button_rect),
+                self.display_surface.blit(skills_surf, self.interface_rect)
+            ]
 
         else:
 
-            self.display_surface.blit(self.assets['buttons']['closed'], self.button_rect)
+            return [self.display_surface.blit(self.assets['buttons']['closed'], self.button_rect)]
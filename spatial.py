@@ -0,0 +1,139 @@
+import math
+import pygame
+from settings import *
+
+
+class SpatialGrid:
+    # Uniform grid over the map, bucketing sprites by which cells their rect overlaps, to find sprites in an area quickly
+    # Static sprites (is_static class attribute) are bucketed once, dynamic ones are re-bucketed by refresh_dynamic,
+    # which only touches the buckets of sprites whose rect moved into different cells
+    # Buckets by the sprite's rect, unless told to use another of its rects (e.g. its hitbox)
+
+    def __init__(self, cell_size, rect_attribute='rect'):
+
+        self.cell_size = cell_size
+        self.rect_attribute = rect_attribute
+        self.cells = {}  # (cell x, cell y) -> {sprite: None}, dicts as ordered sets
+        self.sprite_cells = {}  # sprite -> (left, top, right, bottom) cell range it is bucketed in
+        self.dynamic_sprites = {}
+        self.pending_sprites = {}
+
+    def get_cell_range(self, rect):
+
+        return (
+            rect.left // self.cell_size,
+            rect.top // self.cell_size,
+            (rect.right - 1) // self.cell_size,
+            (rect.bottom - 1) // self.cell_size
+        )
+
+    def add(self, sprite):
+        # Bucketing waits until the next query, as sprites often still set their rect after being added to groups
+
+        self.pending_sprites[sprite] = None
+        if not getattr(sprite, 'is_static', False):
+            self.dynamic_sprites[sprite] = None
+
+    def remove(self, sprite):
+
+        self.pending_sprites.pop(sprite, None)
+        self.dynamic_sprites.pop(sprite, None)
+        cell_range = self.sprite_cells.pop(sprite, None)
+        if cell_range is not None:
+            self.remove_from_cells(sprite, cell_range)
+
+    def add_to_cells(self, sprite, cell_range):
+
+        left, top, right, bottom = cell_range
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                self.cells.setdefault((x, y), {})[sprite] = None
+        self.sprite_cells[sprite] = cell_range
+
+    def remove_from_cells(self, sprite, cell_range):
+
+        left, top, right, bottom = cell_range
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = self.cells[(x, y)]
+                del cell[sprite]
+                if not cell:
+                    del self.cells[(x, y)]
+
+    def refresh(self, sprite):
+        # Re-bucket one sprite if its rect has moved into different cells
+
+        cell_range = self.get_cell_range(getattr(sprite, self.rect_attribute))
+        old_cell_range = self.sprite_cells.get(sprite)
+        if cell_range != old_cell_range:
+            if old_cell_range is not None:
+                self.remove_from_cells(sprite, old_cell_range)
+            self.add_to_cells(sprite, cell_range)
+
+    def refresh_dynamic(self):
+
+        for sprite in self.pending_sprites:
+            if sprite not in self.dynamic_sprites:
+                self.refresh(sprite)
+        self.pending_sprites.clear()
+
+        for sprite in self.dynamic_sprites:
+            self.refresh(sprite)
+
+    def query(self, rect):
+        # All sprites bucketed in cells overlapping rect (so may include some just outside it), each once
+
+        self.refresh_dynamic()
+
+        found = {}
+        left, top, right, bottom = self.get_cell_range(rect)
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = self.cells.get((x, y))
+                if cell is not None:
+                    found.update(cell)
+        return found.keys()
+
+    def traverse(self, start, end):
+        # Yields (time, sprites) for each cell the line from start to end crosses, in order along it, with the time
+        # (0 at start, 1 at end) the line enters the cell, walking cell to cell (Amanatides & Woo's grid DDA)
+
+        self.refresh_dynamic()
+
+        size = self.cell_size
+        x, y = int(start[0] // size), int(start[1] // size)
+        end_x, end_y = int(end[0] // size), int(end[1] // size)
+        dx, dy = end[0] - start[0], end[1] - start[1]
+
+        # Per axis: which way we step, time the line next crosses into another cell, and time it takes to cross a cell
+        step_x, next_x, cross_x = get_traverse_axis(start[0], dx, x, size)
+        step_y, next_y, cross_y = get_traverse_axis(start[1], dy, y, size)
+
+        time = 0
+        while time <= 1:
+
+            cell = self.cells.get((x, y))
+            if cell is not None:
+                yield time, cell.keys()
+
+            if x == end_x and y == end_y:
+                break
+
+            if next_x < next_y:
+                time = next_x
+                x += step_x
+                next_x += cross_x
+            else:
+                time = next_y
+                y += step_y
+                next_y += cross_y
+
+
+def get_traverse_axis(start, delta, cell, cell_size):
+
+    if delta > 0:
+        return 1, ((cell + 1) * cell_size - start) / delta, cell_size / delta
+    elif delta < 0:
+        return -1, (cell * cell_size - start) / delta, cell_size / -delta
+    else:
+        return 0, math.inf, math.inf
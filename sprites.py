@@ -1,12 +1,16 @@
 import pygame
 import random
 from settings import *
+from timers import get_ticks
 from pygame.math import Vector2
 
 
 class Generic(pygame.sprite.Sprite):
     # Base class for all sprites we extend
 
+    # Whether the sprite stays where it was created, which lets the camera's spatial index bucket it just once
+    is_static = True
+
     def __init__(self, pos, surf, groups, z=Z_LAYERS['main']):
 
         super().__init__(groups)
@@ -23,12 +27,12 @@ class SelfDestructGeneric(Generic):
 
         super().__init__(pos, surf, groups, z)
 
-        self.time_created = pygame.time.get_ticks()
+        self.time_created = get_ticks()
         self.death_time = death_time
 
     def update(self, dt):
 
-        current_time = pygame.time.get_ticks()
+        current_time = get_ticks()
         if current_time - self.time_created >= self.death_time:
             self.kill()
 
@@ -54,25 +58,68 @@ class HouseWall(Generic):
         self.hitbox.center = bounding_rect.center
 
 
-class CollisionBlock(Generic):
-    # Generic sprite, we do not draw, but we have a different scaled & shifted hitbox
+class HouseRoof(Generic):
+    # A whole building's roof, prerendered from its tiles into one image
+    # Knows the building's floor, so the level can hide the roof while the player is inside
+
+    def __init__(self, tiles, floor_rects, groups):
+        # Tiles are (rect, surface), drawn in the same order the camera would draw them as separate sprites
+
+        tiles = sorted(tiles, key=lambda tile: (tile[0].centery, tile[0].centerx))
+        rect = tiles[0][0].unionall([tile_rect for tile_rect, surf in tiles])
+
+        image = pygame.Surface(rect.size, pygame.SRCALPHA)
+        image.blits([(surf, tile_rect.move(-rect.x, -rect.y)) for tile_rect, surf in tiles], doreturn=False)
+
+        super().__init__(rect.topleft, image, groups, z=Z_LAYERS['house roof'])
 
-    def __init__(self, pos, shift, groups):
+        self.floor_rects = floor_rects
 
-        super().__init__(pos, pygame.Surface((TILE_SIZE, TILE_SIZE)), groups)
+    def is_inside(self, hitbox):
+        # Same as Player.update_house_status, but for just this building's floor
 
-        self.hitbox = self.rect.inflate(-self.rect.width * 0.4, -self.rect.height * 0.4)
+        sides_inside = [
+            any(r.collidepoint(point) for r in self.floor_rects)
+            for point in [hitbox.midbottom, hitbox.midtop, hitbox.midleft, hitbox.midright]
+        ]
+        return sum(sides_inside) >= 3
 
-        if shift['right']:
-            self.hitbox.x += self.rect.width * 0.2
-        elif shift['left']:
-            self.hitbox.x -= self.rect.width * 0.2
 
-        # Because of top-down 3D effect, move up more than down
-        if shift['up']:
-            self.hitbox.y -= self.rect.height * 0.3
-        elif shift['down']:
-            self.hitbox.y += self.rect.height * 0.1
+class Collider(pygame.sprite.Sprite):
+    # Blocks movement, but is never drawn, so it has no image, and its rect is just its hitbox
+    # Covers a rectangle of collision tiles with the same shifts: its hitbox spans from the top left tile's hitbox to
+    # the bottom right's, so also fills the gaps there were between the tiles' hitboxes
+
+    is_static = True
+
+    def __init__(self, tiles, shift, groups):
+        # Tiles are (left, top, right, bottom) in tile coordinates, right & bottom inclusive
+
+        super().__init__(groups)
+
+        left, top, right, bottom = tiles
+        self.hitbox = get_collision_tile_hitbox(left, top, shift).union(get_collision_tile_hitbox(right, bottom, shift))
+        self.rect = self.hitbox
+
+
+def get_collision_tile_hitbox(x, y, shift):
+    # A collision tile's hitbox is a scaled down tile, shifted depending on which collision layers the tile was on
+
+    rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+    hitbox = rect.inflate(-rect.width * 0.4, -rect.height * 0.4)
+
+    if shift['right']:
+        hitbox.x += rect.width * 0.2
+    elif shift['left']:
+        hitbox.x -= rect.width * 0.2
+
+    # Because of top-down 3D effect, move up more than down
+    if shift['up']:
+        hitbox.y -= rect.height * 0.3
+    elif shift['down']:
+        hitbox.y += rect.height * 0.1
+
+    return hitbox
 
 
 class Animated(Generic):
@@ -161,6 +208,8 @@ class FallingTreeParticleEffect(StaticParticleEffect):
 class MovingParticleEffect(Animated):
     # Moving animated sprite that kills itself after a certain time
 
+    is_static = False
+
     def __init__(self, pos, frames, direction, death_time, speed, groups, animation_speed=5, start_on_random_frame=False, func=None, z=Z_LAYERS['main']):
 
         super().__init__(pos, frames, groups, animation_speed, z)
@@ -176,7 +225,7 @@ class MovingParticleEffect(Animated):
 
         # Death
         self.death_time = death_time
-        self.creation_time = pygame.time.get_ticks()
+        self.creation_time = get_ticks()
         self.func = func
 
     def move(self, dt):
@@ -186,7 +235,7 @@ class MovingParticleEffect(Animated):
 
     def update(self, dt):
 
-        current_time = pygame.time.get_ticks()
+        current_time = get_ticks()
         if current_time - self.creation_time >= self.death_time:
             if self.func is not None:
                 self.func(self.image, self.rect)
@@ -0,0 +1,114 @@
+import os
+import gc
+import json
+import time
+import pygame
+from settings import *
+from contextlib import contextmanager
+
+
+class StartupTracer:
+    # Nested timing scopes around the phases of starting the game, to see where time-to-first-frame goes
+    # Each scope also records how the number of surfaces, the memory they hold, and the process's memory changed
+    # Does nothing unless STARTUP_TRACE['enabled'] is set, at which point Game prints a report & writes JSON at the end
+
+    def __init__(self, enabled):
+
+        self.enabled = enabled
+        self.root = self.new_scope('startup')
+        self.stack = [self.root]
+        self.overhead = 0  # Time spent measuring surfaces & memory, which we take back off the scopes' timings
+
+    @staticmethod
+    def new_scope(name):
+
+        return {'name': name, 'seconds': 0, 'surfaces': 0, 'surface bytes': 0, 'rss bytes': 0, 'children': []}
+
+    @staticmethod
+    def surface_stats():
+        # Surfaces aren't tracked by the garbage collector themselves, but the lists, dicts & objects holding them are
+        # So counting surfaces referred to by anything the collector tracks finds practically all of them
+
+        surfaces = {}
+        for obj in gc.get_objects():
+            for referent in gc.get_referents(obj):
+                if isinstance(referent, pygame.Surface):
+                    surfaces[id(referent)] = referent
+
+        # Subsurfaces share their parent's pixels, so only count memory for surfaces that own theirs
+        surface_bytes = sum(s.get_height() * s.get_pitch() for s in surfaces.values() if s.get_parent() is None)
+
+        return len(surfaces), surface_bytes
+
+    @staticmethod
+    def rss_bytes():
+        # Resident memory of the whole process. Only available on Linux, 0 elsewhere
+
+        if not os.path.exists('/proc/self/statm'):
+            return 0
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    @contextmanager
+    def scope(self, name):
+
+        if not self.enabled:
+            yield
+            return
+
+        scope = self.new_scope(name)
+        self.stack[-1]['children'].append(scope)
+        self.stack.append(scope)
+
+        surfaces_before, surface_bytes_before = self.surface_stats()
+        rss_before = self.rss_bytes()
+        overhead_before = self.overhead
+        start_time = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            end_time = time.perf_counter()
+            scope['seconds'] = end_time - start_time - (self.overhead - overhead_before)
+            surfaces_after, surface_bytes_after = self.surface_stats()
+            scope['surfaces'] = surfaces_after - surfaces_before
+            scope['surface bytes'] = surface_bytes_after - surface_bytes_before
+            scope['rss bytes'] = self.rss_bytes() - rss_before
+            self.stack.pop()
+            self.overhead += time.perf_counter() - end_time
+
+    def report(self):
+
+        lines = ['%-48s %10s %10s %12s %12s' % ('Phase', 'ms', 'Surfaces', 'Surface MB', 'RSS MB')]
+
+        def add_lines(scope, depth):
+            lines.append('%-48s %10.1f %+10d %+12.1f %+12.1f' % (
+                '  ' * depth + scope['name'],
+                scope['seconds'] * 1000,
+                scope['surfaces'],
+                scope['surface bytes'] / 2**20,
+                scope['rss bytes'] / 2**20
+            ))
+            for child in scope['children']:
+                add_lines(child, depth + 1)
+
+        for child in self.root['children']:
+            add_lines(child, 0)
+
+        return '\n'.join(lines)
+
+    def finish(self):
+        # Called once the game is ready to draw its first frame
+
+        if not self.enabled:
+            return
+
+        self.root['seconds'] = sum(child['seconds'] for child in self.root['children'])
+
+        print(self.report())
+        with open(STARTUP_TRACE['json path'], 'w') as f:
+            json.dump(self.root, f, indent=2)
+
+
+STARTUP_TRACER = StartupTracer(enabled=STARTUP_TRACE['enabled'])
+trace_startup = STARTUP_TRACER.scope
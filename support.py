@@ -5,7 +5,9 @@ import sys
 import pygame
 from settings import *
 from util import *
+from assets import AssetPack
 from pytmx.util_pygame import load_pygame
+from main import Game
 
 
 def import_sprite_sheet(cols, rows, path):
@@ -54,10 +56,33 @@ def flip(path, x, y):
     pygame.image.save(surf, path)
 
 
+def build_asset_pack():
+    # Pack every image the game imports into a single file of raw pixel buffers, scaled the same way the game imports
+    # them, so startup can memory-map them rather than decoding & scaling each PNG. Re-run when graphics change
+    # We find out which images the game loads, and whether scaled, by starting it up and seeing what it loaded, so the
+    # pack follows whatever the game asks for, whether through the asset cache or not (like the map background)
+
+    Game(headless=True)
+
+    images = []
+    for path, scale in sorted(loaded_images):
+        surf = pygame.image.load(path)
+        if scale:
+            surf = pygame.transform.scale_by(surf, ZOOM_FACTOR)
+        images.append((path, scale, surf))
+
+    AssetPack.write(ASSET_PACK['path'], images)
+    print('Packed %s images into %s' % (len(images), ASSET_PACK['path']))
+
+
 if __name__ == '__main__':
 
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'pack':
+        build_asset_pack()
+        sys.exit()
     #
     # frames = import_sprite_sheet(4, 3, 'graphics/ui/skills/icons/tools-n-meterial-items.png')
 
@@ -0,0 +1,109 @@
+import pygame
+from settings import *
+
+
+# The water & ground layers cover the whole map but never change, apart from water animating (all tiles in lockstep)
+# So rather than a sprite per water tile, we bake them into chunks of the map ahead of time: the camera then only
+# draws the few chunks on screen, and one shared clock animates all the water
+
+
+class AnimationClock:
+    # Frame index shared by everything animating in lockstep, advanced once per frame (like Animated.animate)
+
+    def __init__(self, frame_count, animation_speed=5):
+
+        self.frame_count = frame_count
+        self.animation_speed = animation_speed
+        self.frame_index = 0
+
+    def update(self, dt):
+
+        self.frame_index += self.animation_speed * dt
+        if self.frame_index >= self.frame_count:
+            self.frame_index = 0
+
+    def get_frame(self):
+
+        return int(self.frame_index)
+
+
+class AnimatedChunk(pygame.sprite.Sprite):
+    # Baked chunk of an animated tile layer, showing whichever frame its clock is on
+
+    is_static = True
+
+    def __init__(self, pos, frames, clock, groups, z):
+
+        super().__init__(groups)
+
+        self.frames = frames
+        self.clock = clock
+        self.z = z
+        self.rect = self.frames[0].get_rect(topleft=pos)
+
+    @property
+    def image(self):
+
+        return self.frames[self.clock.get_frame()]
+
+
+def group_tiles_into_chunks(tiles):
+    # Tile coordinates -> {chunk coordinates: tile coordinates in that chunk}
+
+    chunk_tiles = TILE_LAYER_CHUNK_SIZE // TILE_SIZE
+    chunks = {}
+    for x, y in tiles:
+        chunks.setdefault((x // chunk_tiles, y // chunk_tiles), []).append((x, y))
+    return chunks
+
+
+def bake_water_chunks(water_tiles, frames):
+    # Returns [(pos, [surface per animation frame])], each surface covering just the water tiles in one chunk
+    # Surfaces are opaque, black where there isn't water, as the screen is cleared to black before drawing anyway
+
+    baked = []
+    for tiles in group_tiles_into_chunks(water_tiles).values():
+
+        left = min(x for x, y in tiles)
+        top = min(y for x, y in tiles)
+        width = max(x for x, y in tiles) - left + 1
+        height = max(y for x, y in tiles) - top + 1
+
+        chunk_frames = []
+        for frame in frames:
+            surf = pygame.Surface((width * TILE_SIZE, height * TILE_SIZE)).convert()
+            surf.fill('black')
+            surf.blits([(frame, ((x - left) * TILE_SIZE, (y - top) * TILE_SIZE)) for x, y in tiles], doreturn=False)
+            chunk_frames.append(surf)
+
+        baked.append(((left * TILE_SIZE, top * TILE_SIZE), chunk_frames))
+
+    return baked
+
+
+def bake_ground_chunks(background):
+    # Returns [(pos, surface)] splitting the background, given unscaled, into chunks scaled up by ZOOM_FACTOR
+    # Chunks that are fully opaque (no water showing through) are converted to opaque surfaces, which blit faster
+    # Scaling up is nearest neighbour, so a chunk is opaque just when it was before, and we check that on the unscaled
+    # background, which has ZOOM_FACTOR squared times fewer pixels to look at
+
+    scaled_background = pygame.transform.scale_by(background, ZOOM_FACTOR)
+    unscaled_chunk_size = TILE_LAYER_CHUNK_SIZE // ZOOM_FACTOR
+
+    baked = []
+    for top in range(0, background.get_height(), unscaled_chunk_size):
+        for left in range(0, background.get_width(), unscaled_chunk_size):
+
+            unscaled_rect = pygame.Rect(left, top, unscaled_chunk_size, unscaled_chunk_size).clip(background.get_rect())
+            rect = pygame.Rect([value * ZOOM_FACTOR for value in unscaled_rect])
+            chunk = scaled_background.subsurface(rect)
+
+            opaque_pixels = pygame.mask.from_surface(background.subsurface(unscaled_rect), threshold=254).count()
+            if opaque_pixels == unscaled_rect.width * unscaled_rect.height:
+                chunk = chunk.convert()
+            else:
+                chunk = chunk.copy()
+
+            baked.append((rect.topleft, chunk))
+
+    return baked
@@ -2,6 +2,22 @@ import pygame
 import random
 
 
+# Where game time comes from. Normally pygame's real clock, but a benchmark or replay can swap in a simulated clock
+tick_source = pygame.time.get_ticks
+
+
+def get_ticks():
+
+    return tick_source()
+
+
+def set_tick_source(func):
+    # Func returns the current time in milliseconds. Pass None to go back to pygame's clock
+
+    global tick_source
+    tick_source = pygame.time.get_ticks if func is None else func
+
+
 class Timer:
 
     def __init__(self, duration, autostart=False, repeat=False, func=None):
@@ -18,7 +34,7 @@ class Timer:
     def activate(self):
 
         self.active = True
-        self.start_time = pygame.time.get_ticks()
+        self.start_time = get_ticks()
 
     def deactivate(self):
 
@@ -28,7 +44,7 @@ class Timer:
     def update(self):
 
         if self.active:
-            current_time = pygame.time.get_ticks()
+            current_time = get_ticks()
             if current_time - self.start_time >= self.duration:
                 self.deactivate()
                 if self.func is not None:
@@ -1,13 +1,17 @@
+import os
 import pygame
+import threading
+from util import *
+from render_backend import get_render_backend
 from settings import *
+from collections import OrderedDict
 
 
 class Transition:
 
     def __init__(self):
 
-        self.display_surface = pygame.display.get_surface()
-        self.image = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.render_backend = get_render_backend()
 
         self.color = 255
         self.speed = -300
@@ -41,28 +45,27 @@ class Transition:
                 self.speed *= -1
                 self.deactivate()
 
-    def display(self):
+    def display(self, sky_lum=255):
+        # Fade by multiplying the screen with our color, along with the sky luminance if the level left it to us
 
         if self.active:
-
-            self.image.fill((self.color, self.color, self.color))
-            self.display_surface.blit(self.image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+            self.render_backend.multiply(get_fade_luminance(self.color, sky_lum))
 
 
 class TransitionWithCutscene:
 
-    def __init__(self, cutscene_frames, animation_speed):
+    def __init__(self, cutscene_folders, animation_speed):
         # Each transition with cutscene object is associated with one of many possible cutscenes,
         # E.g. if we want to pick between facing left or right in cutscene down river
         # When we activate we'll pass in the key for the specific cutscene we want to play
+        # Cutscenes are given as the folder holding their frames, which are streamed in when the cutscene is used
 
-        self.display_surface = pygame.display.get_surface()
-        self.image = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.render_backend = get_render_backend()
 
         self.color = 255
         self.speed = -300
 
-        self.cutscene_options = {key: Cutscene(value, animation_speed) for key, value in cutscene_frames.items()}
+        self.cutscene_options = {key: Cutscene(value, animation_speed) for key, value in cutscene_folders.items()}
 
         # We will set func & cutscene everytime we 'activate' the transition
         self.active = False
@@ -75,6 +78,9 @@ class TransitionWithCutscene:
         self.func = func
         self.cutscene = self.cutscene_options[cutscene_key]
 
+        # Start decoding the cutscene in the background while we fade out, so its first frames are ready to play
+        self.cutscene.prefetch()
+
     def deactivate(self):
 
         self.active = False
@@ -115,34 +121,48 @@ class TransitionWithCutscene:
                 if not self.cutscene.active:
                     self.deactivate()
 
-    def display(self):
+    def display(self, sky_lum=255):
 
         if self.active:
             self.cutscene.display()
             if not self.playing_cutscene_without_transition():
-                self.image.fill((self.color, self.color, self.color))
-                self.display_surface.blit(self.image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+                self.render_backend.multiply(get_fade_luminance(self.color, sky_lum))
+
+
+def get_fade_luminance(color, sky_lum):
+    # So one multiply of the whole screen does both the fade & the sky, rather than a pass each
+
+    return int(color) * sky_lum // 255
 
 
 class Cutscene:
     # Basically just an animated image covering entire screen, which loops on the last frame
+    # Frames aren't held in memory: they're streamed from disk by a background thread while the cutscene plays
 
-    def __init__(self, frames, animation_speed):
+    def __init__(self, path_to_folder, animation_speed):
 
-        self.display_surface = pygame.display.get_surface()
+        self.render_backend = get_render_backend()
+        self.display_surface = self.render_backend.surface
 
-        self.frames = frames
+        self.frames = CutsceneFrameStream(path_to_folder, capacity=CUTSCENE_BUFFERED_FRAMES)
         self.frame_index = 0
-        self.image = self.frames[self.frame_index]
+        self.image = None  # Only loaded while playing
+        self.image_index = None  # Which frame image is, which lags behind frame_index if decoding falls behind
 
         # Animation speed worked out when generating frames for the smoothest look with the least amount of frames
         self.animation_speed = animation_speed
 
         self.active = False
 
+    def prefetch(self):
+
+        self.frames.start()
+
     def play(self):
 
         self.active = True
+        self.frames.start()  # Does nothing if we already started prefetching
+        self.refresh_image()
         pygame.mouse.set_visible(False)
 
     def reached_end(self):
@@ -154,7 +174,9 @@ class Cutscene:
 
         self.active = False
         self.frame_index = 0
-        self.image = self.frames[self.frame_index]
+        self.image = None
+        self.image_index = None
+        self.frames.stop()
         pygame.mouse.set_visible(True)
 
     def update(self, dt):
@@ -163,11 +185,109 @@ class Cutscene:
             self.frame_index += self.animation_speed * dt
             if self.frame_index >= len(self.frames):
                 self.frame_index = len(self.frames) - 1
-            self.image = self.frames[int(self.frame_index)]
+            self.refresh_image()
+
+    def refresh_image(self):
+        # Show the current frame once the background thread has decoded it, holding the last one shown until then
+
+        index = int(self.frame_index)
+        if index != self.image_index:
+            frame = self.frames.get(index)
+            if frame is not None:
+                self.image = frame
+                self.image_index = index
 
     def display(self):
 
         if self.active:
 
-            # Draw the current frame
-            self.display_surface.blit(self.image, (0, 0))
+            # Draw the current frame, or black if the first one isn't decoded yet
+            self.render_backend.mark_overlay_drawn([self.display_surface.get_rect()])
+            if self.image is None:
+                self.display_surface.fill('black')
+            else:
+                self.display_surface.blit(self.image, (0, 0))
+
+
+class CutsceneFrameStream:
+    # Decodes the frames of a cutscene in order on a background thread, staying at most capacity frames ahead of the
+    # frame being played. Decoded frames are converted for drawing as they go into a bounded ring, the oldest dropped
+    # first as new ones come in. pygame releases the GIL while decoding, so the game keeps running smoothly meanwhile
+    # Frames are never decoded on the main thread: if the thread falls behind, the frame isn't ready yet
+
+    def __init__(self, path_to_folder, capacity):
+
+        self.paths = [os.path.join(path_to_folder, f) for f in sorted_frame_files(path_to_folder)]
+        self.capacity = capacity
+
+        self.frames = OrderedDict()  # Frame index -> surface, in the order they were decoded
+        self.condition = threading.Condition()  # Guards everything below, and wakes the thread when it can continue
+        self.thread = None
+        self.running = False
+        self.play_index = 0
+        self.next_index = 0  # Next frame the background thread will decode
+
+    def __len__(self):
+
+        return len(self.paths)
+
+    def start(self):
+
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+            self.play_index = 0
+            self.next_index = 0
+
+        self.thread = threading.Thread(target=self.prefetch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Stop the background thread and drop every decoded frame
+
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        self.frames.clear()
+
+    def store(self, index, frame):
+        # Must hold the condition lock
+
+        self.frames[index] = frame
+        while len(self.frames) > self.capacity:
+            self.frames.popitem(last=False)
+
+    def prefetch(self):
+        # Background thread loop
+
+        while True:
+
+            with self.condition:
+                while self.running and (self.next_index >= len(self.paths) or self.next_index - self.play_index >= self.capacity):
+                    self.condition.wait()
+                if not self.running:
+                    return
+                index = self.next_index
+                self.next_index += 1
+
+            frame = pygame.image.load(self.paths[index]).convert_alpha()
+
+            with self.condition:
+                if self.running and index >= self.play_index:
+                    self.store(index, frame)
+
+    def get(self, index):
+        # Returns the frame ready to draw, or None if the background thread hasn't decoded it yet
+
+        with self.condition:
+            self.play_index = index
+            if index > self.next_index:
+                self.next_index = index  # Skip the thread ahead to the frame we're playing, rather than ones we've passed
+            self.condition.notify_all()
+            return self.frames.get(index)
@@ -1,11 +1,20 @@
 import pygame
 from util import *
 from settings import *
+from atlas import FRAME_ATLAS
 from sprites import FallingTreeParticleEffect
+from collisions import CollisionGroup
 
 
 class NormalTree(pygame.sprite.Sprite):
 
+    # Trees never move, see Generic
+    is_static = True
+
+    # Frames shared by every tree, and how many trees are using them
+    shared_frames = None
+    shared_frames_users = 0
+
     def __init__(self, pos, all_sprites, groups):
 
         super().__init__(groups)
@@ -23,12 +32,27 @@ class NormalTree(pygame.sprite.Sprite):
         self.all_sprites = all_sprites
 
     def import_assets(self):
+        # Every tree shares the same frames, so only the first tree imports them & packs them into the atlas
+
+        if NormalTree.shared_frames is None:
+            NormalTree.shared_frames = FRAME_ATLAS.pack({
+                'tree': import_image('graphics/trees/normal_tree/tree.png'),
+                'stump': import_image('graphics/trees/normal_tree/stump.png'),
+                'falling animation': import_folders_as_lists('graphics/trees/normal_tree/falling'),
+            })
+
+        NormalTree.shared_frames_users += 1
+        self.frames = NormalTree.shared_frames
 
-        self.frames = {
-            'tree': import_image('graphics/trees/normal_tree/tree.png'),
-            'stump': import_image('graphics/trees/normal_tree/stump.png'),
-            'falling animation': import_folders_as_lists('graphics/trees/normal_tree/falling'),
-        }
+    def release_assets(self):
+        # The last tree to go releases the shared frames
+
+        NormalTree.shared_frames_users -= 1
+        if NormalTree.shared_frames_users == 0:
+            NormalTree.shared_frames = None
+            release_image('graphics/trees/normal_tree/tree.png')
+            release_image('graphics/trees/normal_tree/stump.png')
+            release_folders_as_lists('graphics/trees/normal_tree/falling')
 
     def refresh_image_and_rects(self):
 
@@ -52,6 +76,11 @@ class NormalTree(pygame.sprite.Sprite):
             self.interaction_rect = self.rect.inflate(-self.rect.width * 0.6, -self.rect.height * 0.6)
             self.interaction_rect.midbottom = self.rect.midbottom
 
+        # Our hitbox changed, so collision groups need to re-bucket us
+        for group in self.groups():
+            if isinstance(group, CollisionGroup):
+                group.refresh(self)
+
     def refresh_new_day(self):
 
         if self.status == 'tree':
@@ -70,6 +99,14 @@ class NormalTree(pygame.sprite.Sprite):
             groups=self.all_sprites
         )
 
+    def kill(self):
+        # Killing an already dead tree mustn't release the shared frames a second time
+
+        was_alive = self.alive()
+        super().kill()
+        if was_alive:
+            self.release_assets()
+
     def is_hit(self, target_pos):
 
         return self.interaction_rect.collidepoint(target_pos)
@@ -1,7 +1,11 @@
 import os
+import math
 import pygame
 import random
 from settings import *
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from assets import ASSET_CACHE, get_asset_pack
 from pygame.math import Vector2
 
 
@@ -12,44 +16,210 @@ def list_folder(path_to_folder):
     return filter(lambda f: not f.startswith('.'), os.listdir(path_to_folder))
 
 
-def import_image(path_to_image, scale=True):
+def sorted_frame_files(path_to_folder):
+    # Animation frames are named by index (0.png, 1.png, ...), return them in numerical order
+
+    return sorted(list_folder(path_to_folder), key=lambda f: int(f.split('.')[0]))
+
+
+def folder_files(path_to_folder):
+
+    return [os.path.join(path_to_folder, f) for f in sorted_frame_files(path_to_folder)]
+
+
+def folder_files_as_dict(path_to_folder):
+
+    return {f.split('.')[0]: os.path.join(path_to_folder, f) for f in list_folder(path_to_folder)}
+
+
+def folders_files_as_lists(path_to_root_folder):
 
-    image = pygame.image.load(path_to_image).convert_alpha()
+    return {folder: folder_files(os.path.join(path_to_root_folder, folder)) for folder in list_folder(path_to_root_folder)}
+
+
+def decode_image(path_to_image, scale=True):
+    # The part of loading an image that doesn't need the display, so is safe to run off the main thread
+
+    image = pygame.image.load(path_to_image)
     if scale:
         image = pygame.transform.scale_by(image, ZOOM_FACTOR)
     return image
 
 
-def import_folder(path_to_folder, scale=True):
+# Every image loaded, from disk or the asset pack, as (path, scaled), so the pack can hold them all (see build_asset_pack)
+loaded_images = set()
 
-    frames = []
 
-    for f in sorted(list_folder(path_to_folder), key=lambda f: int(f.split('.')[0])):
-        path_to_file = os.path.join(path_to_folder, f)
-        frames.append(import_image(path_to_file, scale=scale))
+def load_image(path_to_image, scale=True):
+    # Decode & scale an image from disk. Use import_image instead, which shares the result through the asset cache
+    # If we've built an asset pack with this image in, we take the raw pixels from there instead
 
-    return frames
+    loaded_images.add((os.path.normpath(path_to_image), scale))
 
+    asset_pack = get_asset_pack()
+    if asset_pack is not None:
+        image = asset_pack.load(path_to_image, scale)
+        if image is not None:
+            return image
 
-def import_folder_as_dict(path_to_folder, scale=True):
+    return decode_image(path_to_image, scale=scale).convert_alpha()
 
-    frames = {}
 
-    for f in list_folder(path_to_folder):
-        path_to_file = os.path.join(path_to_folder, f)
-        frames[f.split('.')[0]] = import_image(path_to_file, scale=scale)
+def import_image(path_to_image, scale=True):
+    # Surfaces are shared between everything importing the same image, so don't draw onto the returned surface,
+    # make a copy first
+
+    return ASSET_CACHE.acquire(path_to_image, scale, lambda: load_image(path_to_image, scale=scale))
+
 
-    return frames
+def import_folder(path_to_folder, scale=True):
+
+    return [import_image(path_to_file, scale=scale) for path_to_file in folder_files(path_to_folder)]
+
+
+def import_folder_as_dict(path_to_folder, scale=True):
+
+    return {
+        name: import_image(path_to_file, scale=scale)
+        for name, path_to_file in folder_files_as_dict(path_to_folder).items()
+    }
 
 
 def import_folders_as_lists(path_to_root_folder, scale=True):
 
-    frames = {}
+    return {
+        folder: [import_image(path_to_file, scale=scale) for path_to_file in paths]
+        for folder, paths in folders_files_as_lists(path_to_root_folder).items()
+    }
 
-    for folder in list_folder(path_to_root_folder):
-        frames[folder] = import_folder(os.path.join(path_to_root_folder, folder), scale=scale)
 
-    return frames
+# Asset manifests. Rather than calling the import functions one after another, a class can describe all of its assets
+# as a nested dict with these specs as leaves, and pass it to import_assets, which decodes every file in parallel
+# Each spec is replaced by exactly what the matching import function would have returned
+
+AssetSpec = namedtuple('AssetSpec', ['kind', 'path', 'scale'])
+
+ASSET_SPEC_FILES = {
+    # How each kind of spec lays out its files, mirroring the import functions
+    'image': lambda path: path,
+    'folder': folder_files,
+    'folder as dict': folder_files_as_dict,
+    'folders as lists': folders_files_as_lists
+}
+
+
+def image_asset(path_to_image, scale=True):
+
+    return AssetSpec('image', path_to_image, scale)
+
+
+def folder_asset(path_to_folder, scale=True):
+
+    return AssetSpec('folder', path_to_folder, scale)
+
+
+def folder_as_dict_asset(path_to_folder, scale=True):
+
+    return AssetSpec('folder as dict', path_to_folder, scale)
+
+
+def folders_as_lists_asset(path_to_root_folder, scale=True):
+
+    return AssetSpec('folders as lists', path_to_root_folder, scale)
+
+
+def map_nested(structure, func, is_leaf):
+    # Rebuild a structure of nested dicts & lists, applying func to every leaf
+
+    if is_leaf(structure):
+        return func(structure)
+    elif isinstance(structure, dict):
+        return {key: map_nested(value, func, is_leaf) for key, value in structure.items()}
+    elif isinstance(structure, list):
+        return [map_nested(value, func, is_leaf) for value in structure]
+    return structure
+
+
+def iter_specs(manifest):
+
+    if isinstance(manifest, AssetSpec):
+        yield manifest
+    elif isinstance(manifest, dict):
+        for value in manifest.values():
+            yield from iter_specs(value)
+    elif isinstance(manifest, list):
+        for value in manifest:
+            yield from iter_specs(value)
+
+
+def import_assets(manifest):
+    # Import everything in a manifest (see above), decoding & scaling files on a thread pool
+    # pygame releases the GIL while decoding & scaling, so this scales with cores
+    # Only converting to the display format, which needs the display, happens back on the main thread
+
+    is_spec = lambda leaf: isinstance(leaf, AssetSpec)
+    is_path = lambda leaf: isinstance(leaf, str)
+
+    # Work out every file we need, in the order we walk the manifest, and which of them aren't cached already
+    spec_files = [ASSET_SPEC_FILES[spec.kind](spec.path) for spec in iter_specs(manifest)]
+
+    to_load = set()
+
+    def add_to_load(path, scale):
+        if (path, scale) not in ASSET_CACHE:
+            to_load.add((path, scale))
+
+    for spec, files in zip(iter_specs(manifest), spec_files):
+        map_nested(files, lambda path: add_to_load(path, spec.scale), is_path)
+
+    loaded_images.update((os.path.normpath(path), scale) for path, scale in to_load)
+
+    # Take what we can from the asset pack, and decode the rest in parallel
+    loaded = {}
+    asset_pack = get_asset_pack()
+    if asset_pack is not None:
+        for path, scale in to_load:
+            image = asset_pack.load(path, scale)
+            if image is not None:
+                loaded[(path, scale)] = image
+
+    with ThreadPoolExecutor(max_workers=ASSET_LOADER_THREADS) as executor:
+        decoding = {
+            (path, scale): executor.submit(decode_image, path, scale)
+            for path, scale in to_load if (path, scale) not in loaded
+        }
+        for key, future in decoding.items():
+            loaded[key] = future.result().convert_alpha()
+
+    # Every image is loaded now, so this just builds the returned structure & takes references through the cache
+    remaining_spec_files = iter(spec_files)
+
+    def import_spec(spec):
+        return map_nested(
+            next(remaining_spec_files),
+            lambda path: ASSET_CACHE.acquire(path, spec.scale, lambda: loaded[(path, spec.scale)]),
+            is_path
+        )
+
+    return map_nested(manifest, import_spec, is_spec)
+
+
+def release_image(path_to_image, scale=True):
+    # Counterpart to import_image, for owners that go away during the game, so the cache can evict unused assets
+
+    ASSET_CACHE.release(path_to_image, scale)
+
+
+def release_folder(path_to_folder, scale=True):
+
+    for f in list_folder(path_to_folder):
+        release_image(os.path.join(path_to_folder, f), scale=scale)
+
+
+def release_folders_as_lists(path_to_root_folder, scale=True):
+
+    for folder in list_folder(path_to_root_folder):
+        release_folder(os.path.join(path_to_root_folder, folder), scale=scale)
 
 
 def random_game_pixel_position():
@@ -57,30 +227,31 @@ def random_game_pixel_position():
     return random.randint(0, GAME_WIDTH), random.randint(0, GAME_HEIGHT)
 
 
-def collide_line(start_point, end_point, collision_sprites, offset=None, interval=TILE_SIZE/10):
-    # Checks if a line from the start to end point would collide with any of the collision sprites
-    # We check at small intervals along line if any collision has taken place
+def collide_line(start_point, end_point, collision_sprites, offset=None):
+    # Checks if a line from the start to end point would collide with any of the collision sprites (a CollisionGroup)
     # We can add a offset, which basically shifts the line in a certain direction, useful as sometimes rects too broad
     # and want to narrow the collision line check
 
-    if not isinstance(start_point, Vector2):
-        start_point = Vector2(start_point)
-    if not isinstance(end_point, Vector2):
-        end_point = Vector2(end_point)
+    start_point = Vector2(start_point)
+    end_point = Vector2(end_point)
+    if offset is not None:
+        start_point += offset
+        end_point += offset
+
+    return collision_sprites.raycast(start_point, end_point) is not None
+
 
-    if offset is None:
-        current_point = start_point.copy()
-    else:
-        current_point = start_point + offset
-        end_point = end_point + offset
+def merge_rects(rects):
+    # Union overlapping rects together, so no area is redrawn twice
 
-    direction = (end_point - current_point).normalize()
-    while True:
-        current_point += direction * interval
-        if any(s.hitbox.collidepoint(current_point) for s in collision_sprites.sprites()):
-            return True
-        if distance_between_vectors(end_point, current_point) < interval:
-            return False
+    merged = []
+    for rect in rects:
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect = rect.union(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
 
 
 def distance_between_vectors(v1, v2):
@@ -96,3 +267,11 @@ def distance_between_vectors(v1, v2):
 def distance_between_sprites(s1, s2):
 
     return distance_between_vectors(s1.rect.center, s2.rect.center)
+
+
+def percentile(sorted_values, p):
+    # Nearest rank percentile
+
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+